@@ -67,6 +67,8 @@ REQUIRED_PKGS = [
     "numpy>=1.17", # We use numpy>=1.17 to have np.random.Generator
     "pyvista",  # For mesh creation and edition and simple vizualization
     "huggingface_hub", # For sharing objects, environments & trained RL policies
+    "filelock",  # For extracting the Unity builds only once
+    "Pillow",  # For the textures of GLTF imports and the compressed camera frames
 ]
 
 RL_REQUIRE = [
@@ -77,9 +79,19 @@ SB3_REQUIRE = [
     "stable-baselines3"
 ]
 
+MSGPACK_REQUIRE = [
+    "msgpack",  # For the msgpack codec of the engines
+]
+
+# VectorRLEnv converts the gym spaces of the actors (from the "rl" extra) to gymnasium spaces: simulate[rl,gymnasium]
+GYMNASIUM_REQUIRE = [
+    "gymnasium",  # For the VectorEnv base class and the spaces of VectorRLEnv
+]
+
 DEV_REQUIRE = [
     "gym==0.21.0",  # For RL action spaces and API
     "stable-baselines3",  # For training with SB3
+    "msgpack",  # For the msgpack codec of the engines
 
     # For background vizualization capabilities (could be optional - note than some Qt backend can have GPL license)
     "pyvistaqt",
@@ -92,6 +104,8 @@ TESTS_REQUIRE = [
 
     "gym",  # For RL action spaces and API
     "stable-baselines3",  # For training with SB3
+    "msgpack",  # For the msgpack codec of the engines
+    "gymnasium",  # For the VectorEnv base class of VectorRLEnv
 ]
 
 DOCS_REQUIRE = [
@@ -103,6 +117,8 @@ QUALITY_REQUIRE = ["black~=22.0", "flake8>=3.8.3", "isort>=5.0.0", "pyyaml>=5.3.
 EXTRAS_REQUIRE = {
     "rl" : RL_REQUIRE,
     "sb3" : SB3_REQUIRE,
+    "msgpack" : MSGPACK_REQUIRE,
+    "gymnasium" : GYMNASIUM_REQUIRE,
      "dev": DEV_REQUIRE + TESTS_REQUIRE + QUALITY_REQUIRE,
      "test": TESTS_REQUIRE,
      "quality": QUALITY_REQUIRE,
@@ -23,7 +23,7 @@ from .assets import *
 from .assets.utils import *
 from .config import Config
 from .engine import *
-from .rl import ParallelRLEnv, RLEnv
+from .rl import ParallelRLEnv, RLEnv, SubprocParallelRLEnv, VectorRLEnv
 from .scene import Scene
 from .utils import logging
 
@@ -971,8 +971,15 @@ class Asset(NodeMixin, object):
         ):
             getattr(self.tree_root, "engine").update_asset(self)
 
+    def _post_attach_parent(self, parent: "Asset"):
+        """NodeMixing method call after attaching to a `parent`."""
+        engine = getattr(self.tree_root, "engine", None)
+        if engine is not None and engine.auto_update:
+            engine.add_asset(self)
+
     def _post_detach_parent(self, parent: "Asset"):
         """NodeMixing method call after detaching from a `parent`."""
-        engine = getattr(self.tree_root, "engine", None)
+        # We are now the root of our own tree, the engine is found from the previous parent
+        engine = getattr(parent.tree_root, "engine", None)
         if engine is not None and engine.auto_update:
             engine.remove_asset(self)
@@ -15,7 +15,7 @@
 # Lint as: python3
 """ A simulate Camera."""
 import itertools
-from typing import Any, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 import numpy as np
 
@@ -38,6 +38,7 @@ except ImportError:
 
 
 ALLOWED_CAMERA_TYPES = ["perspective", "orthographic"]
+ALLOWED_FRAME_ENCODINGS = ["raw", "png", "jpeg"]
 
 
 class Camera(Asset):
@@ -54,6 +55,11 @@ class Camera(Asset):
         camera_type: The type of camera.
         xmag: The x magnification of the Camera.
         ymag: The y magnification of the Camera.
+        frame_encoding: How the backend sends the frames of the camera: "raw" uint8 buffers, lossless "png"
+            or lossy "jpeg" compressed images. Default: "raw"
+        jpeg_quality: The quality (1-95) of the "jpeg" encoding. Default: 90
+        grayscale: Whether to return single channel grayscale frames. Default: False
+        downsample: The factor by which the frames are average pooled before being sent. Default: 1
     """
 
     __NEW_ID = itertools.count()  # Singleton to count instances of the classes for automatic naming
@@ -77,6 +83,10 @@ class Camera(Asset):
         is_actor: bool = False,
         parent: Optional["Asset"] = None,
         children: Optional[List["Asset"]] = None,
+        frame_encoding: str = "raw",
+        jpeg_quality: int = 90,
+        grayscale: bool = False,
+        downsample: int = 1,
     ):
         super().__init__(
             name=name,
@@ -90,6 +100,19 @@ class Camera(Asset):
         self.width = width
         self.height = height
 
+        if frame_encoding not in ALLOWED_FRAME_ENCODINGS:
+            raise ValueError(
+                f"Frame encoding {frame_encoding} is not allowed. Allowed encodings are: {ALLOWED_FRAME_ENCODINGS}"
+            )
+        if not 1 <= jpeg_quality <= 95:
+            raise ValueError("jpeg_quality must be between 1 and 95.")
+        if downsample < 1 or width < downsample or height < downsample:
+            raise ValueError("downsample must be at least 1 and at most the width and height of the camera.")
+        self.frame_encoding = frame_encoding
+        self.jpeg_quality = jpeg_quality
+        self.grayscale = grayscale
+        self.downsample = downsample
+
         self.camera_type = camera_type
         self.sensor_tag = sensor_tag
         if camera_type not in ALLOWED_CAMERA_TYPES:
@@ -110,7 +133,26 @@ class Camera(Asset):
 
     @property
     def observation_space(self) -> spaces.Box:
-        return spaces.Box(low=0, high=255, shape=[3, self.height, self.width], dtype=np.uint8)
+        return spaces.Box(low=0, high=255, shape=self.frame_shape, dtype=np.uint8)
+
+    @property
+    def frame_shape(self) -> List[int]:
+        """Shape (channels, height, width) of the frames returned for this camera."""
+        return [1 if self.grayscale else 3, self.height // self.downsample, self.width // self.downsample]
+
+    @property
+    def frame_settings(self) -> Dict[str, Any]:
+        """The frame encoding settings which differ from the defaults (raw full size RGB frames)."""
+        settings = {}
+        if self.frame_encoding != "raw":
+            settings["frame_encoding"] = self.frame_encoding
+            if self.frame_encoding == "jpeg":
+                settings["jpeg_quality"] = self.jpeg_quality
+        if self.grayscale:
+            settings["grayscale"] = True
+        if self.downsample > 1:
+            settings["downsample"] = self.downsample
+        return settings
 
     def copy(self, with_children: bool = True, **kwargs: Any):
         """Return a copy of the Camera with copy of the children attached to the copy."""
@@ -132,6 +174,10 @@ class Camera(Asset):
             camera_type=self.camera_type,
             xmag=self.xmag,
             ymag=self.ymag,
+            frame_encoding=self.frame_encoding,
+            jpeg_quality=self.jpeg_quality,
+            grayscale=self.grayscale,
+            downsample=self.downsample,
         )
 
         if with_children:
@@ -173,6 +219,10 @@ class CameraDistant(Camera):
         is_actor: bool = False,
         parent: Optional["Asset"] = None,
         children: Optional[List["Asset"]] = None,
+        frame_encoding: str = "raw",
+        jpeg_quality: int = 90,
+        grayscale: bool = False,
+        downsample: int = 1,
     ):
 
         if position is None:
@@ -198,4 +248,8 @@ class CameraDistant(Camera):
             camera_type=camera_type,
             xmag=xmag,
             ymag=ymag,
+            frame_encoding=frame_encoding,
+            jpeg_quality=jpeg_quality,
+            grayscale=grayscale,
+            downsample=downsample,
         )
@@ -31,6 +31,8 @@ from .gltflib.enums import AccessorType, ComponentType
 
 
 UNSUPPORTED_REQUIRED_EXTENSIONS = ["KHR_draco_mesh_compression"]
+# Frame encoding settings of the cameras stored in their extras (see Camera.frame_settings)
+CAMERA_FRAME_SETTINGS = ["frame_encoding", "jpeg_quality", "grayscale", "downsample"]
 
 
 # TODO remove this GLTFReader once the new version of pyvista is released 0.34+ (included in it)
@@ -236,6 +238,8 @@ def build_node_tree(
         # Let's add a Camera
         gltf_camera = gltf_model.cameras[gltf_node.camera]
         camera_type = gltf_camera.type
+        extras = gltf_camera.extras if isinstance(gltf_camera.extras, dict) else {}
+        frame_settings = {key: value for key, value in extras.items() if key in CAMERA_FRAME_SETTINGS}
 
         scene_node = Camera(
             aspect_ratio=gltf_camera.perspective.aspectRatio if camera_type == "perspective" else None,
@@ -245,6 +249,7 @@ def build_node_tree(
             camera_type=camera_type,
             xmag=gltf_camera.orthographic.xmag if camera_type == "orthographic" else None,
             ymag=gltf_camera.orthographic.ymag if camera_type == "orthographic" else None,
+            **frame_settings,
             **common_kwargs,
         )
     # It is a light
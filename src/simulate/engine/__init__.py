@@ -1,6 +1,7 @@
 from .blender_engine import BlenderEngine
 from .engine import Engine
 from .godot_engine import GodotEngine
+from .instrumentation import LatencyHistogram, LatencyRecorder
 from .notebook_engine import NotebookEngine, in_notebook
 from .pyvista_engine import PyVistaEngine
 from .unity_engine import UnityEngine
@@ -1,11 +1,10 @@
 import atexit
 import base64
-import json
-import socket
 from typing import TYPE_CHECKING, Any, Dict, Optional
 
 from ..utils import logging
 from .engine import Engine
+from .transport import EngineTransport
 
 
 if TYPE_CHECKING:
@@ -32,37 +31,26 @@ class BlenderEngine(Engine):
         self.end_frame = end_frame
         self.time_step = time_step
 
-        self.host = "127.0.0.1"
-        self.port = 55001
+        self.transport = EngineTransport(host="127.0.0.1", port=55001)
         self._initialize_server()
         atexit.register(self._close)
 
     def _initialize_server(self):
         """Create TCP socket and listen for connections"""
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.bind((self.host, self.port))
-        logger.info("Server started. Waiting for connection...")
-        self.socket.listen()
-        self.client, self.client_address = self.socket.accept()
-        logger.info(f"Connection from {self.client_address}")
-
-    def _send_bytes(self, bytes_data: bytes, ack: bool) -> Optional[str]:
-        """Send bytes to socket and wait for response"""
-        self.client.sendall(bytes_data)
-        if ack:
-            return self._get_response()
+        self.transport.listen()
+        self.transport.accept()
+
+    @property
+    def host(self) -> str:
+        return self.transport.host
+
+    @property
+    def port(self) -> int:
+        return self.transport.port
 
     def _get_response(self) -> str:
         """Get response from socket"""
-        while True:
-            data_length = self.client.recv(4)
-            data_length = int.from_bytes(data_length, "little")
-
-            if data_length:
-                response = ""  # TODO: string concatenation may be slow
-                while len(response) < data_length:
-                    response += self.client.recv(data_length - len(response)).decode()
-                return response
+        return self.transport.recv().decode()
 
     def _send_gltf(self, bytes_data: bytes):
         """Send gltf bytes to socket"""
@@ -70,12 +58,12 @@ class BlenderEngine(Engine):
         command = {"type": "build_scene", "contents": {"b64bytes": b64_bytes}}
         self.run_command(command)
 
-    def run_command(self, command: Dict, ack: bool = True):
+    def run_command(self, command: Dict, ack: bool = True) -> Optional[str]:
         """Encode command and send the bytes to the socket"""
-        message = json.dumps(command)
-        logger.info(f"Sending command: {message}")
-        message_bytes = len(message).to_bytes(4, "little") + bytes(message.encode())
-        return self._send_bytes(message_bytes, ack)
+        logger.info(f"Sending command: {command['type']}")
+        self.transport.send(command)
+        if ack:
+            return self._get_response()
 
     def update_asset(self, root_node: "Asset"):
         # TODO update and make this API more consistent with all the
@@ -109,7 +97,7 @@ class BlenderEngine(Engine):
         """Close the environment"""
         command = {"type": "close", "contents": {"message": "close"}}
         self.run_command(command)
-        self.client.close()
+        self.transport.close()
 
         try:
             atexit.unregister(self._close)
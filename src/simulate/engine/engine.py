@@ -32,6 +32,10 @@ class Engine:
         """Add an asset or update its location and all its children in the scene"""
         pass
 
+    def add_asset(self, asset_node: "Asset"):
+        """Add an asset and all its children attached to the scene"""
+        pass
+
     def remove_asset(self, asset_node: "Asset"):
         """Remove an asset and all its children in the scene"""
         pass
@@ -40,6 +44,10 @@ class Engine:
         """Recreate all the assets in the scene (recreate the scene)"""
         pass
 
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        """Aggregated statistics of the engine (e.g. traffic and timings of a backend)"""
+        return {}
+
     def __repr__(self):
         return f"{self.__class__.__name__}"
 
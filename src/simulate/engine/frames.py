@@ -0,0 +1,96 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+""" Encoding of the camera frames sent by the backends.
+
+A camera sensor buffer holds the frames of all the maps and actors, shape (n_show, n_actors, channels, height, width).
+When the camera asks for a compressed encoding ("png" or "jpeg"), the backend sends the images one after the other
+in the bytes buffer, with their sizes:
+
+    {"type": "uint8", "shape": [...], "encoding": "png", "frameSizes": [...], "bytesBuffer": ...}
+
+The shape is the one of the decoded frames, after the optional grayscale conversion and downsampling.
+The compressed encodings require Pillow, which is only imported when frames are encoded or decoded.
+"""
+import io
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+
+COMPRESSED_FRAME_ENCODINGS = {"png": "PNG", "jpeg": "JPEG"}
+# ITU-R 601 luma weights used for the grayscale conversion
+GRAYSCALE_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _pil_image():
+    try:
+        import PIL.Image
+    except ImportError:
+        raise ImportError(
+            "The png and jpeg camera frame encodings require Pillow, install it with `pip install Pillow`."
+        ) from None
+    return PIL.Image
+
+
+def encode_frames(frames: np.ndarray, encoding: str, quality: int = 90) -> Tuple[bytes, List[int]]:
+    """Compress channel-first uint8 frames of shape (..., channels, height, width), channels being 1 or 3.
+
+    Returns:
+        data (bytes): the compressed images, one after the other.
+        frame_sizes (List[int]): the size in bytes of each compressed image.
+    """
+    image_format = COMPRESSED_FRAME_ENCODINGS[encoding]
+    pil_image = _pil_image()
+    images = frames.reshape((-1, *frames.shape[-3:]))
+    chunks = []
+    for image in images:
+        image = image[0] if image.shape[0] == 1 else image.transpose(1, 2, 0)
+        output = io.BytesIO()
+        pil_image.fromarray(np.ascontiguousarray(image)).save(output, format=image_format, quality=quality)
+        chunks.append(output.getvalue())
+    return b"".join(chunks), [len(chunk) for chunk in chunks]
+
+
+def decode_frames(
+    data: Union[bytes, bytearray, memoryview, np.ndarray], frame_sizes: Sequence[int], shape: Sequence[int]
+) -> np.ndarray:
+    """Decompress PNG or JPEG images into one channel-first uint8 array of the given shape."""
+    pil_image = _pil_image()
+    frames = np.empty(shape, dtype=np.uint8)
+    images = frames.reshape((-1, *frames.shape[-3:]))
+    if len(frame_sizes) != len(images):
+        raise ValueError(f"Got {len(frame_sizes)} compressed frames for a buffer of shape {tuple(shape)}")
+    view = memoryview(data).cast("B")
+    offset = 0
+    for image, size in zip(images, frame_sizes):
+        decoded = np.asarray(pil_image.open(io.BytesIO(view[offset : offset + size])))
+        image[:] = decoded[None] if decoded.ndim == 2 else decoded.transpose(2, 0, 1)
+        offset += size
+    return frames
+
+
+def transform_frames(frames: np.ndarray, grayscale: bool = False, downsample: int = 1) -> np.ndarray:
+    """Convert channel-first RGB frames of shape (..., 3, height, width) to grayscale and/or average pool them."""
+    if grayscale and frames.shape[-3] == 3:
+        gray = np.tensordot(GRAYSCALE_WEIGHTS, frames, axes=([0], [frames.ndim - 3]))
+        frames = np.expand_dims(gray, axis=-3).round().astype(np.uint8)
+    if downsample > 1:
+        *batch, channels, height, width = frames.shape
+        height, width = height // downsample, width // downsample
+        frames = frames[..., : height * downsample, : width * downsample]
+        blocks = frames.reshape((*batch, channels, height, downsample, width, downsample))
+        frames = blocks.mean(axis=(-3, -1)).round().astype(np.uint8)
+    return frames
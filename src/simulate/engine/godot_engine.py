@@ -1,11 +1,10 @@
 import atexit
 import base64
-import json
-import socket
 from typing import TYPE_CHECKING, Any, Dict, Union
 
 from ..utils import logging
 from .engine import Engine
+from .transport import EngineTransport
 
 
 if TYPE_CHECKING:
@@ -36,8 +35,7 @@ class GodotEngine(Engine):
         self.action_space = None
         self.observation_space = None
 
-        self.host = "127.0.0.1"
-        self.port = engine_port
+        self.transport = EngineTransport(host="127.0.0.1", port=engine_port)
         self._initialize_server()
         atexit.register(self._close)
 
@@ -45,55 +43,27 @@ class GodotEngine(Engine):
 
     def _initialize_server(self):
         """Create TCP socket and listen for connections"""
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.bind((self.host, self.port))
-        logger.info("Server started. Waiting for connection...")
-        self.socket.listen()
-        self.client, self.client_address = self.socket.accept()
-        logger.info(f"Connection from {self.client_address}")
-
-    def _send_bytes(self, bytes_data: bytes, ack: bool):
-        """Send bytes to socket and wait for response"""
-        self.client.sendall(bytes_data)
-        if ack:
-            return self._get_response()
+        self.transport.listen()
+        self.transport.accept()
+
+    @property
+    def host(self) -> str:
+        return self.transport.host
+
+    @property
+    def port(self) -> int:
+        return self.transport.port
 
     def run_command(self, command: str, **kwargs: Any) -> Union[Dict, str]:
         """Encode command and send the bytes to the socket"""
-        message = json.dumps({"type": command, **kwargs})
-        message_bytes = len(message).to_bytes(4, "little") + bytes(message.encode())
-        self.client.sendall(message_bytes)
-        response = self._get_response()
-        try:
-            return json.loads(response)
-        except Exception as e:
-            logger.warning(f"Exception loading response json data: {e}")
-            return response
+        self.run_command_async(command, **kwargs)
+        return self.get_response_async()
 
     def run_command_async(self, command: str, **kwargs: Any):
-        message = json.dumps({"type": command, **kwargs})
-        message_bytes = len(message).to_bytes(4, "little") + bytes(message.encode())
-        self.client.sendall(message_bytes)
-
-    def _get_response(self) -> str:
-        """Get response from socket"""
-        while True:
-            data_length = self.client.recv(4)
-            data_length = int.from_bytes(data_length, "little")
-
-            if data_length:
-                response = ""  # TODO: string concatenation may be slow
-                while len(response) < data_length:
-                    response += self.client.recv(data_length - len(response)).decode()
-                return response
+        self.transport.send({"type": command, **kwargs})
 
     def get_response_async(self) -> Union[Dict, str]:
-        response = self._get_response()
-        try:
-            return json.loads(response)
-        except Exception as e:
-            logger.warning(f"Exception loading response json data: {e}")
-            return response
+        return self.transport.recv_decoded()
 
     def show(self, **kwargs: Any) -> Union[Dict, str]:
         """Show the scene in Godot"""
@@ -127,7 +97,7 @@ class GodotEngine(Engine):
             self.run_command("close")
         except Exception as e:
             logger.error(f"Exception sending close message: {e}")
-        self.client.close()
+        self.transport.close()
         try:
             atexit.unregister(self._close)
         except Exception as e:
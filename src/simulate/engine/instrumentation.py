@@ -0,0 +1,131 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+""" Latency histograms of the phases of the commands sent to a backend.
+
+The phases recorded by the UnityEngine are:
+    - encode: encoding of the command (JSON, binary frame or msgpack)
+    - send: writing the command on the socket
+    - wait: waiting for the first bytes of the reply (backend compute time and wire latency)
+    - receive: reading the rest of the reply from the socket
+    - decode: decoding of the reply
+    - command/<type>: round trip of a command from its send to the reception of its reply, e.g. command/Step
+      (including the steps sent with step_send_async and received later)
+
+The RLEnv adds:
+    - convert: conversion of the observations, rewards and dones of a step to NumPy arrays
+    - step: total duration of RLEnv.step
+"""
+import bisect
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+
+
+# Upper bounds in seconds of the histogram buckets: 4 buckets per decade from 1 microsecond to 100 seconds
+DEFAULT_BUCKETS = [10 ** (exponent / 4) for exponent in range(-24, 9)]
+
+
+class LatencyHistogram:
+    """Histogram of durations with fixed buckets (the last bucket counts the durations above the last bound).
+
+    Args:
+        buckets: increasing upper bounds in seconds of the buckets, default to 4 buckets per decade from 1µs to 100s.
+    """
+
+    def __init__(self, buckets: Optional[List[float]] = None):
+        self.buckets = list(buckets) if buckets is not None else DEFAULT_BUCKETS
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Estimate of the q-th percentile (0 <= q <= 100): upper bound of the bucket in which it falls."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        cumulated = 0
+        for bound, count in zip(self.buckets + [self.max], self.counts):
+            cumulated += count
+            if cumulated >= rank and count:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": self.buckets,
+            "counts": list(self.counts),
+        }
+
+
+class LatencyRecorder:
+    """Per-phase latency histograms, optionally forwarding every measure to a callback.
+
+    Args:
+        callback: called with (phase, seconds) for each recorded duration.
+        buckets: upper bounds in seconds of the histogram buckets.
+    """
+
+    def __init__(self, callback: Optional[Callable[[str, float], None]] = None, buckets: Optional[List[float]] = None):
+        self.callback = callback
+        self.buckets = buckets
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    @staticmethod
+    def now() -> float:
+        return perf_counter()
+
+    def record(self, phase: str, seconds: float):
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = LatencyHistogram(self.buckets)
+        histogram.record(seconds)
+        if self.callback is not None:
+            self.callback(phase, seconds)
+
+    def record_since(self, phase: str, start: float) -> float:
+        """Record the time elapsed since `start` (a value of now()) and return the current time."""
+        end = perf_counter()
+        self.record(phase, end - start)
+        return end
+
+    def as_dict(self) -> Dict[str, Dict]:
+        """Summary of the histogram of each phase (count, total, mean, min, max, percentiles and buckets)."""
+        return {phase: histogram.as_dict() for phase, histogram in self.histograms.items()}
+
+    def reset(self):
+        self.histograms.clear()
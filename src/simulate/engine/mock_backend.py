@@ -0,0 +1,449 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+""" A pure-Python stand-in for the Unity backend.
+
+It speaks the same bridge protocol as the Unity executable (Handshake/Initialize/Step/Reset/Close) and returns
+synthetic sensor observations, rewards and dones, so the Python side of the bridge can be tested and
+profiled without a game engine. It is launched through the `engine_exe` argument of the Unity engine:
+
+    engine_exe = mock_backend_command("--sensor", "CameraSensor:uint8:3,72,96", "--step_latency", "0.01")
+    scene = sm.Scene(engine="unity", engine_exe=engine_exe)
+"""
+import argparse
+import base64
+import os
+import socket
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .frames import COMPRESSED_FRAME_ENCODINGS, encode_frames
+from .protocol import (
+    LENGTH_PREFIX,
+    NODE_ARRAY_FIELDS,
+    PROTOCOL_VERSION,
+    decode_message,
+    encode_json_message,
+    get_codec,
+    msgpack,
+    recv_message,
+)
+
+
+MOCK_BACKEND_MODULE = "simulate.engine.mock_backend"
+CONNECT_RETRIES = 50
+CONNECT_RETRIES_DELAY = 0.1
+
+BUFFER_DTYPES = {"uint8": np.uint8, "float": np.float32}
+
+
+def mock_backend_command(*args: str) -> List[str]:
+    """Return an `engine_exe` argument list launching the mock backend with the given command line arguments."""
+    return [sys.executable, "-m", MOCK_BACKEND_MODULE, *args]
+
+
+def parse_sensor_spec(spec: str) -> Tuple[str, str, Tuple[int, ...]]:
+    """Parse a sensor specification formatted as TAG:TYPE:SHAPE, e.g. CameraSensor:uint8:3,72,96"""
+    sensor_tag, buffer_type, shape = spec.split(":")
+    if buffer_type not in BUFFER_DTYPES:
+        raise ValueError(f"Sensor buffer type should be one of {list(BUFFER_DTYPES)}, got {buffer_type}")
+    return sensor_tag, buffer_type, tuple(int(dim) for dim in shape.split(","))
+
+
+class MockBackend:
+    """Synthetic backend answering the bridge commands.
+
+    Args:
+        sensors: list of (sensor_tag, buffer type, shape) of the sensors of each actor.
+        n_actors_per_map: number of actors in each map.
+        episode_length: number of steps after which a map is done (and automatically reset).
+        truncation: whether to report the episodes ended by episode_length as truncated, in actor_truncated_buffer.
+        step_latency: artificial compute time in seconds added to each Step.
+        binary_protocol: whether to accept the binary frame protocol when the client requests it.
+        incremental_updates: whether to accept incremental scene updates when the client requests them.
+        msgpack_codec: whether to accept the msgpack codec when the client requests it (and msgpack is installed).
+        shared_memory: whether to write replies in the shared memory ring when the client provides one.
+        timings: whether to report the timings of the steps in their replies when the client requests it.
+        node_arrays: whether to return the node states as arrays when the client requests it (binary protocol only).
+        frame_encoding: "raw", or "png"/"jpeg" to compress the frames of the uint8 sensors with 1 or 3 channels.
+        jpeg_quality: quality of the "jpeg" frame encoding.
+        seed: seed of the random generator used for observations and rewards.
+    """
+
+    def __init__(
+        self,
+        sensors: Sequence[Tuple[str, str, Tuple[int, ...]]],
+        n_actors_per_map: int = 1,
+        episode_length: int = 100,
+        truncation: bool = False,
+        step_latency: float = 0.0,
+        binary_protocol: bool = True,
+        incremental_updates: bool = True,
+        msgpack_codec: bool = True,
+        shared_memory: bool = True,
+        timings: bool = True,
+        node_arrays: bool = True,
+        frame_encoding: str = "raw",
+        jpeg_quality: int = 90,
+        seed: Optional[int] = None,
+    ):
+        self.sensors = list(sensors)
+        self.n_actors_per_map = n_actors_per_map
+        self.episode_length = episode_length
+        self.truncation = truncation
+        self.step_latency = step_latency
+        self.accept_binary_protocol = binary_protocol
+        self.accept_msgpack = msgpack_codec and msgpack is not None
+        self.accept_shared_memory = shared_memory
+        self.accept_timings = timings
+        self.accept_node_arrays = node_arrays
+        self.accept_incremental_updates = incremental_updates
+        self.frame_encoding = frame_encoding
+        self.jpeg_quality = jpeg_quality
+        self.rng = np.random.default_rng(seed)
+
+        self.client = None
+        self.binary_protocol = False
+        self.codec = get_codec("json")
+        self.shared_memory = None
+        self.shared_memory_n_slots = 0
+        self.shared_memory_slot_size = 0
+        self.shared_memory_slot = 0
+        self.timings = False
+        self.step_timings: Dict[str, float] = {}
+        self.node_names: List[str] = []
+        self.node_arrays = False
+        self.n_steps = 0
+        self.n_show = 0
+        self.episode_steps = np.zeros(0, dtype=np.int64)
+        self.sensor_buffers: Dict[str, np.ndarray] = {}
+        self.encoded_sensor_buffers: Dict[str, Dict] = {}
+
+    def connect(self, host: str, port: int):
+        for _ in range(CONNECT_RETRIES):
+            try:
+                self.client = socket.create_connection((host, port))
+                return
+            except ConnectionRefusedError:
+                time.sleep(CONNECT_RETRIES_DELAY)
+        raise ConnectionError(f"Could not connect to {host}:{port}")
+
+    def connect_unix(self, path: str):
+        for _ in range(CONNECT_RETRIES):
+            try:
+                self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.client.connect(path)
+                return
+            except (ConnectionRefusedError, FileNotFoundError):
+                self.client.close()
+                time.sleep(CONNECT_RETRIES_DELAY)
+        raise ConnectionError(f"Could not connect to {path}")
+
+    def run(self):
+        """Answer commands until the Close command is received or the connection is closed."""
+        while True:
+            try:
+                message = decode_message(recv_message(self.client))
+            except ConnectionError:
+                break
+            received = time.perf_counter()
+            command = message.pop("type", None)
+            if command == "Close":
+                break
+            handler = getattr(self, f"_on_{str(command).lower()}", None)
+            if handler is None:
+                self._send_error(f"Unknown command: {command}")
+                continue
+            sequence = message.pop("sequence", None)
+            response = handler(**message)
+            if sequence is not None:
+                response["sequence"] = sequence
+            if self.timings and command == "Step":
+                response["timings"] = {"received": received, **self.step_timings, "sent": time.perf_counter()}
+            # The client only reads the shared memory ring once it received the reply to Initialize
+            self._send(response, use_shared_memory=command != "Initialize")
+            if command == "Handshake":
+                # The reply to the Handshake is always sent with the JSON protocol
+                self.binary_protocol = "binary_protocol" in response
+                self.codec = get_codec(response.get("codec", "binary") if self.binary_protocol else "json")
+        self._detach_shared_memory()
+        self.client.close()
+
+    def _send(self, response: Dict, use_shared_memory: bool = True):
+        if self.binary_protocol:
+            frame = self.codec.encode(response)
+            if use_shared_memory and self.shared_memory is not None and self._write_shared_memory(frame):
+                return
+            self.client.sendall(frame)
+        else:
+            self.client.sendall(encode_json_message(self._as_json_buffers(response)))
+
+    def _write_shared_memory(self, frame: Union[bytes, bytearray]) -> bool:
+        """Write a frame in the next slot of the ring and notify the client, return False if it doesn't fit."""
+        nbytes = len(frame) - LENGTH_PREFIX.size
+        if nbytes > self.shared_memory_slot_size:
+            return False
+        slot = self.shared_memory_slot
+        start = slot * self.shared_memory_slot_size
+        self.shared_memory.buf[start : start + nbytes] = memoryview(frame)[LENGTH_PREFIX.size :]
+        self.client.sendall(self.codec.encode({"shared_memory_slot": slot, "nbytes": nbytes}))
+        self.shared_memory_slot = (slot + 1) % self.shared_memory_n_slots
+        return True
+
+    def _attach_shared_memory(self, name: str, n_slots: int, slot_size: int):
+        self.shared_memory = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            # The segment is owned (and unlinked) by the client, not by this process
+            resource_tracker.unregister(self.shared_memory._name, "shared_memory")
+        self.shared_memory_n_slots = n_slots
+        self.shared_memory_slot_size = slot_size
+        self.shared_memory_slot = 0
+
+    def _detach_shared_memory(self):
+        if self.shared_memory is not None:
+            self.shared_memory.close()
+            self.shared_memory = None
+
+    def _send_error(self, error: str):
+        payload = error.encode()
+        self.client.sendall(LENGTH_PREFIX.pack(len(payload)) + payload)
+
+    @staticmethod
+    def _as_json_buffers(response: Dict) -> Dict:
+        """Replace raw buffers by the list buffers sent by the Unity JSON bridge."""
+        json_response = {}
+        for key, value in response.items():
+            if isinstance(value, dict) and "encoding" in value:
+                # Compressed frames stay a bytes buffer, sent as a base64 string
+                value = {**value, "bytesBuffer": base64.b64encode(value["bytesBuffer"].tobytes()).decode("ascii")}
+            elif isinstance(value, dict) and "bytesBuffer" in value:
+                list_key = "uintBuffer" if value["type"] == "uint8" else "floatBuffer"
+                value = {
+                    "type": value["type"],
+                    "shape": value["shape"],
+                    list_key: value["bytesBuffer"].ravel().tolist(),
+                }
+            elif isinstance(value, dict):
+                value = MockBackend._as_json_buffers(value)
+            json_response[key] = value
+        return json_response
+
+    def _on_handshake(
+        self,
+        binary_protocol: Optional[int] = None,
+        codec: Optional[str] = None,
+        incremental_updates: Optional[bool] = None,
+    ) -> Dict:
+        response = {}
+        if incremental_updates and self.accept_incremental_updates:
+            response["incremental_updates"] = True
+        if not self.accept_binary_protocol or binary_protocol != PROTOCOL_VERSION:
+            return response
+        response["binary_protocol"] = PROTOCOL_VERSION
+        if codec == "msgpack" and self.accept_msgpack:
+            response["codec"] = codec
+        return response
+
+    def _on_initialize(
+        self,
+        maps: Optional[List[str]] = None,
+        n_show: Optional[int] = None,
+        b64bytes: Optional[str] = None,
+        bytes: Optional[np.ndarray] = None,
+        **kwargs,
+    ) -> Dict:
+        # The scene is not loaded, only report the size of the received GLB
+        scene_bytes = base64.b64decode(b64bytes) if b64bytes is not None else bytes
+        response = {"scene_nbytes": len(scene_bytes) if scene_bytes is not None else 0}
+        if "max_in_flight" in kwargs:
+            # Commands are answered one after the other, any window can be accepted
+            response["max_in_flight"] = kwargs["max_in_flight"]
+        self.timings = self.accept_timings and bool(kwargs.get("timings"))
+        if self.timings:
+            response["timings"] = True
+        self.node_names = list(kwargs.get("node_arrays", {}).get("names", []))
+        self.node_arrays = self.accept_node_arrays and self.binary_protocol and "node_arrays" in kwargs
+        if self.node_arrays:
+            response["node_arrays"] = True
+        self._detach_shared_memory()
+        if self.binary_protocol and self.accept_shared_memory and "shared_memory" in kwargs:
+            self._attach_shared_memory(**kwargs["shared_memory"])
+            response["shared_memory"] = True
+
+        self.n_show = (n_show or len(maps)) if maps else 0
+        self.episode_steps = np.zeros(self.n_show, dtype=np.int64)
+        self.sensor_buffers = {}
+        for sensor_tag, buffer_type, shape in self.sensors:
+            full_shape = (self.n_show, self.n_actors_per_map, *shape)
+            if buffer_type == "uint8":
+                buffer = self.rng.integers(0, 256, size=full_shape, dtype=np.uint8)
+            else:
+                buffer = self.rng.standard_normal(size=full_shape, dtype=np.float32)
+            self.sensor_buffers[sensor_tag] = buffer
+        # The observations don't change between steps, they are only compressed once
+        self.encoded_sensor_buffers = {}
+        if self.frame_encoding in COMPRESSED_FRAME_ENCODINGS and self.n_show:
+            for sensor_tag, buffer_type, shape in self.sensors:
+                if buffer_type == "uint8" and len(shape) == 3 and shape[0] in (1, 3):
+                    data, frame_sizes = encode_frames(
+                        self.sensor_buffers[sensor_tag], self.frame_encoding, quality=self.jpeg_quality
+                    )
+                    self.encoded_sensor_buffers[sensor_tag] = {
+                        "type": "uint8",
+                        "shape": list(self.sensor_buffers[sensor_tag].shape),
+                        "encoding": self.frame_encoding,
+                        "frameSizes": frame_sizes,
+                        "bytesBuffer": np.frombuffer(data, dtype=np.uint8),
+                    }
+        return response
+
+    def _on_step(self, frame_skip: Optional[int] = None, return_nodes: Optional[bool] = None, **kwargs) -> Dict:
+        start = time.perf_counter()
+        if self.step_latency:
+            time.sleep(self.step_latency)
+        # Nothing is simulated or rendered, the artificial latency stands for the physics
+        self.step_timings = {"physics": time.perf_counter() - start, "render": 0.0, "sensors": 0.0}
+
+        response = {"nodes": {}, "frames": {}}
+        if frame_skip != 0:
+            self.n_steps += 1
+        if return_nodes is not False:
+            node_states = self._node_states()
+            if self.node_arrays:
+                response["node_arrays"] = node_states
+            else:
+                response["nodes"] = {
+                    name: {"name": name, **{field: array[i].tolist() for field, array in node_states.items()}}
+                    for i, name in enumerate(self.node_names)
+                }
+        if self.n_show == 0:
+            return response
+        start = time.perf_counter()
+
+        # Observations are preallocated so that the backend itself costs as little as possible
+        response["actor_sensor_buffers"] = {
+            sensor_tag: self.encoded_sensor_buffers.get(sensor_tag)
+            or self._buffer(buffer_type, self.sensor_buffers[sensor_tag])
+            for sensor_tag, buffer_type, _ in self.sensors
+        }
+        if frame_skip != 0:
+            self.episode_steps += 1
+        done = self.episode_steps >= self.episode_length
+        self.episode_steps[done] = 0
+
+        reward = self.rng.random((self.n_show, self.n_actors_per_map), dtype=np.float32)
+        done = np.repeat(done[:, None], self.n_actors_per_map, axis=1).astype(np.float32)
+        response["actor_reward_buffer"] = self._buffer("float", reward)
+        response["actor_done_buffer"] = self._buffer("float", done)
+        if self.truncation:
+            # All the episodes end on the time limit
+            response["actor_truncated_buffer"] = self._buffer("float", done)
+        if done.any():
+            # The maps are not actually reset, their last observations are the current ones
+            response["actor_terminal_sensor_buffers"] = response["actor_sensor_buffers"]
+        self.step_timings["sensors"] = time.perf_counter() - start
+        return response
+
+    def _on_updateassets(
+        self, nodes: Optional[Dict] = None, added: Optional[Dict] = None, removed: Optional[List[str]] = None
+    ) -> Dict:
+        # The scene itself is not simulated, only report what was received
+        return {"updated": len(nodes or {}), "added": len(added or {}), "removed": len(removed or [])}
+
+    def _on_reset(self, seed: Optional[int] = None, **kwargs) -> Dict:
+        self.episode_steps[:] = 0
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        return {}
+
+    def _node_states(self) -> Dict[str, np.ndarray]:
+        """Synthetic node states: node i is at (i, number of steps, 0) without rotation and moves up."""
+        n_nodes = len(self.node_names)
+        node_states = {field: np.zeros((n_nodes, size), dtype=np.float32) for field, size in NODE_ARRAY_FIELDS.items()}
+        node_states["position"][:, 0] = np.arange(n_nodes)
+        node_states["position"][:, 1] = self.n_steps
+        node_states["rotation"][:, 3] = 1.0
+        node_states["velocity"][:, 1] = 1.0
+        return node_states
+
+    @staticmethod
+    def _buffer(buffer_type: str, buffer: np.ndarray) -> Dict:
+        return {"type": buffer_type, "shape": list(buffer.shape), "bytesBuffer": buffer}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Pure-Python stand-in for the Simulate Unity backend.")
+    parser.add_argument("--host", default="localhost", help="Host of the Python server to connect to.")
+    parser.add_argument(
+        "--args",
+        nargs="*",
+        default=[],
+        help="Unity style arguments, e.g. `--args port 55001` or `--args socket /tmp/simulate/engine.sock`.",
+    )
+    parser.add_argument(
+        "--sensor",
+        action="append",
+        default=[],
+        type=parse_sensor_spec,
+        help="Sensor of each actor as TAG:TYPE:SHAPE (e.g. CameraSensor:uint8:3,72,96), can be repeated.",
+    )
+    parser.add_argument("--n_actors_per_map", type=int, default=1)
+    parser.add_argument("--episode_length", type=int, default=100)
+    parser.add_argument("--truncation", action="store_true", help="Report the ends of episodes as truncations.")
+    parser.add_argument("--step_latency", type=float, default=0.0, help="Artificial latency in seconds per Step.")
+    parser.add_argument("--json", action="store_true", help="Only answer with the JSON protocol.")
+    parser.add_argument("--no_msgpack", action="store_true", help="Don't accept the msgpack codec.")
+    parser.add_argument("--no_shared_memory", action="store_true", help="Always send replies on the socket.")
+    parser.add_argument("--no_timings", action="store_true", help="Don't report the timings of the steps.")
+    parser.add_argument("--no_node_arrays", action="store_true", help="Always return the node states as dicts.")
+    parser.add_argument("--no_incremental_updates", action="store_true", help="Don't accept scene updates.")
+    parser.add_argument(
+        "--frame_encoding", default="raw", choices=["raw", *COMPRESSED_FRAME_ENCODINGS], help="Camera frames encoding."
+    )
+    parser.add_argument("--jpeg_quality", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=None)
+    # Unity flags such as -batchmode or -nographics are ignored
+    args, _ = parser.parse_known_args(argv)
+
+    unity_args = dict(zip(args.args[::2], args.args[1::2]))
+    backend = MockBackend(
+        sensors=args.sensor or [("StateSensor", "float", (3,))],
+        n_actors_per_map=args.n_actors_per_map,
+        episode_length=args.episode_length,
+        truncation=args.truncation,
+        step_latency=args.step_latency,
+        binary_protocol=not args.json,
+        msgpack_codec=not args.no_msgpack,
+        shared_memory=not args.no_shared_memory,
+        timings=not args.no_timings,
+        node_arrays=not args.no_node_arrays,
+        incremental_updates=not args.no_incremental_updates,
+        frame_encoding=args.frame_encoding,
+        jpeg_quality=args.jpeg_quality,
+        seed=args.seed,
+    )
+    if "socket" in unity_args:
+        backend.connect_unix(unity_args["socket"])
+    else:
+        backend.connect(args.host, int(unity_args.get("port", 55001)))
+    backend.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
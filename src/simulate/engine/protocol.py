@@ -0,0 +1,335 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+""" Wire protocol shared by the socket engines.
+
+Every message on the socket is prefixed by its length as a 4 bytes little-endian integer.
+The payload is either a UTF-8 JSON document (legacy protocol) or a binary frame:
+
+    magic (4 bytes, b"SIMB") | version (uint8) | padding (3 bytes) | header length (uint32)
+    header (UTF-8 JSON, padded with spaces to a multiple of 8 bytes)
+    tensor sections (raw contiguous buffers, each aligned on 8 bytes)
+
+The header is a JSON object {"message": {...}, "sections": [...]} where each section is described by
+{"path": [...], "dtype": str, "shape": [...], "offset": int, "nbytes": int}. The path is the list of keys
+where the tensor should be inserted in the message. Offsets are relative to the start of the first section.
+
+Binary frames are only used once the backend acknowledged them in the reply to a JSON Handshake command
+{"type": "Handshake", "binary_protocol": PROTOCOL_VERSION}, sent before the first Initialize command.
+
+The Handshake can also request another codec with {"codec": name}. The "msgpack" codec (requires the msgpack
+package) sends msgpack frames: the magic b"SIMP" followed by the msgpack encoded message, in which NumPy arrays
+are msgpack extension types. It is much faster than JSON to decode large node dictionaries.
+
+The Handshake also requests incremental scene updates with {"incremental_updates": true}, with any codec. Only a
+backend acknowledging them receives the UpdateAssets commands sending the changes made to the scene after show().
+
+Replies can also be written by the backend as binary frames in a ring of shared memory slots created by the
+Python side, the socket then only carries a small {"shared_memory_slot": int, "nbytes": int} notification.
+
+The Initialize command can request the node states as arrays with {"node_arrays": {"names": [...]}}, the table
+of the nodes (row i of the arrays is the node names[i]). A backend which acknowledges {"node_arrays": true} then
+replaces the "nodes" dictionaries of its Step replies by {"node_arrays": {field: (n_nodes, size) float32}} for the
+fields of NODE_ARRAY_FIELDS, with NaN rows for the nodes which don't exist anymore.
+
+When the backend acknowledges {"timings": true} in the reply to Initialize, Step replies carry
+{"timings": {"received": t, "sent": t, "physics": s, "render": s, "sensors": s}}: the timestamps of the backend
+clock at which the command was received and the reply sent, and the durations in seconds of the phases of the step.
+"""
+import json
+import socket
+import struct
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FRAME_MAGIC = b"SIMB"
+MSGPACK_MAGIC = b"SIMP"
+MSGPACK_NUMPY_EXT_TYPE = 1
+PROTOCOL_VERSION = 1
+FRAME_ALIGNMENT = 8
+
+# Fields of the node states returned as arrays, and their number of columns
+NODE_ARRAY_FIELDS = {"position": 3, "rotation": 4, "velocity": 3, "angular_velocity": 3}
+
+LENGTH_PREFIX = struct.Struct("<I")
+FRAME_PREFIX = struct.Struct("<4sB3xI")
+
+
+def _align(n: int) -> int:
+    return (n + FRAME_ALIGNMENT - 1) // FRAME_ALIGNMENT * FRAME_ALIGNMENT
+
+
+def _extract_tensors(
+    message: Dict, path: List[str], sections: List[Dict], buffers: List[np.ndarray], offset: int
+) -> Tuple[Dict, int]:
+    """Return a copy of the message without its NumPy arrays, which are listed in sections/buffers."""
+    header = {}
+    for key, value in message.items():
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value)
+            sections.append(
+                {
+                    "path": path + [key],
+                    "dtype": value.dtype.str,
+                    "shape": list(value.shape),
+                    "offset": offset,
+                    "nbytes": value.nbytes,
+                }
+            )
+            buffers.append(value)
+            offset = _align(offset + value.nbytes)
+        elif isinstance(value, dict):
+            header[key], offset = _extract_tensors(value, path + [key], sections, buffers, offset)
+        elif isinstance(value, np.generic):
+            # NumPy scalars are sent as Python scalars in the JSON header, as with the msgpack codec
+            header[key] = value.item()
+        else:
+            header[key] = value
+    return header, offset
+
+
+def _json_header_default(value: Any) -> Any:
+    """NumPy scalars nested in lists of the header are sent as Python scalars, as with the msgpack codec."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json_message(message: Dict) -> bytes:
+    """Encode a message with the legacy JSON protocol (length prefix included)."""
+    payload = json.dumps(message).encode()
+    return LENGTH_PREFIX.pack(len(payload)) + payload
+
+
+def encode_binary_message(message: Dict) -> bytearray:
+    """Encode a message as a binary frame (length prefix included).
+
+    NumPy arrays found in the (nested) message dictionaries are sent as raw tensor sections,
+    everything else is kept in the JSON header.
+    """
+    sections, buffers = [], []
+    header, data_length = _extract_tensors(message, [], sections, buffers, 0)
+    header_bytes = json.dumps({"message": header, "sections": sections}, default=_json_header_default).encode()
+    header_bytes += b" " * (_align(len(header_bytes)) - len(header_bytes))
+
+    frame_length = FRAME_PREFIX.size + len(header_bytes) + data_length
+    frame = bytearray(LENGTH_PREFIX.size + frame_length)
+    LENGTH_PREFIX.pack_into(frame, 0, frame_length)
+    FRAME_PREFIX.pack_into(frame, LENGTH_PREFIX.size, FRAME_MAGIC, PROTOCOL_VERSION, len(header_bytes))
+    data_start = LENGTH_PREFIX.size + FRAME_PREFIX.size + len(header_bytes)
+    frame[LENGTH_PREFIX.size + FRAME_PREFIX.size : data_start] = header_bytes
+    frame_array = np.frombuffer(frame, dtype=np.uint8)
+    for section, buffer in zip(sections, buffers):
+        start = data_start + section["offset"]
+        frame_array[start : start + section["nbytes"]] = buffer.reshape(-1).view(np.uint8)
+    return frame
+
+
+def is_binary_frame(buffer: Union[bytes, bytearray, memoryview]) -> bool:
+    return len(buffer) >= FRAME_PREFIX.size and bytes(buffer[:4]) == FRAME_MAGIC
+
+
+def is_msgpack_frame(buffer: Union[bytes, bytearray, memoryview]) -> bool:
+    return len(buffer) >= len(MSGPACK_MAGIC) and bytes(buffer[: len(MSGPACK_MAGIC)]) == MSGPACK_MAGIC
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        header = msgpack.packb([value.dtype.str, list(value.shape)])
+        return msgpack.ExtType(MSGPACK_NUMPY_EXT_TYPE, header + value.tobytes())
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Can't encode object of type {type(value).__name__} with msgpack")
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    if code != MSGPACK_NUMPY_EXT_TYPE:
+        return msgpack.ExtType(code, data)
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(data)
+    dtype, shape = unpacker.unpack()
+    return np.frombuffer(data, dtype=np.dtype(dtype), offset=unpacker.tell()).reshape(shape)
+
+
+def encode_msgpack_message(message: Dict) -> bytes:
+    """Encode a message as a msgpack frame (length prefix included), NumPy arrays are extension types."""
+    if msgpack is None:
+        raise ImportError("The msgpack codec requires the msgpack package: `pip install msgpack`")
+    payload = MSGPACK_MAGIC + msgpack.packb(message, default=_msgpack_default)
+    return LENGTH_PREFIX.pack(len(payload)) + payload
+
+
+def decode_msgpack_frame(buffer: Union[bytes, bytearray, memoryview]) -> Dict:
+    """Decode a msgpack frame (without its length prefix)."""
+    if msgpack is None:
+        raise ImportError("The msgpack codec requires the msgpack package: `pip install msgpack`")
+    return msgpack.unpackb(memoryview(buffer)[len(MSGPACK_MAGIC) :], ext_hook=_msgpack_ext_hook)
+
+
+def decode_binary_frame(buffer: Union[bytes, bytearray, memoryview]) -> Dict:
+    """Decode a binary frame (without its length prefix).
+
+    Tensor sections are returned as NumPy arrays viewing the received buffer (no copy).
+    """
+    magic, version, header_length = FRAME_PREFIX.unpack_from(buffer, 0)
+    if magic != FRAME_MAGIC:
+        raise ValueError("Not a binary frame")
+    if version > PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported binary protocol version {version} (max supported {PROTOCOL_VERSION})")
+
+    data_start = FRAME_PREFIX.size + header_length
+    header = json.loads(bytes(buffer[FRAME_PREFIX.size : data_start]))
+    message = header["message"]
+    for section in header["sections"]:
+        dtype = np.dtype(section["dtype"])
+        tensor = np.frombuffer(
+            buffer, dtype=dtype, count=section["nbytes"] // dtype.itemsize, offset=data_start + section["offset"]
+        ).reshape(section["shape"])
+        node = message
+        for key in section["path"][:-1]:
+            node = node.setdefault(key, {})
+        node[section["path"][-1]] = tensor
+    return message
+
+
+def decode_message(buffer: Union[bytes, bytearray, memoryview]) -> Any:
+    """Decode a received payload, either a binary frame, a msgpack frame or a JSON document."""
+    if is_binary_frame(buffer):
+        return decode_binary_frame(buffer)
+    if is_msgpack_frame(buffer):
+        return decode_msgpack_frame(buffer)
+    return json.loads(buffer)
+
+
+class Codec:
+    """Encoding of the messages sent to the backend, replies are decoded whatever their format."""
+
+    name = None
+
+    def encode(self, message: Dict) -> Union[bytes, bytearray]:
+        """Encode a message, length prefix included."""
+        raise NotImplementedError()
+
+    def decode(self, buffer: Union[bytes, bytearray, memoryview]) -> Any:
+        return decode_message(buffer)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class JsonCodec(Codec):
+    """Legacy JSON documents, NumPy arrays are not supported."""
+
+    name = "json"
+
+    def encode(self, message: Dict) -> bytes:
+        return encode_json_message(message)
+
+
+class BinaryFrameCodec(Codec):
+    """Binary frames: JSON header and raw tensor sections."""
+
+    name = "binary"
+
+    def encode(self, message: Dict) -> bytearray:
+        return encode_binary_message(message)
+
+
+class MsgpackCodec(Codec):
+    """msgpack frames with NumPy arrays as extension types."""
+
+    name = "msgpack"
+
+    def encode(self, message: Dict) -> bytes:
+        return encode_msgpack_message(message)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), BinaryFrameCodec(), MsgpackCodec())}
+
+
+def get_codec(name: str) -> Codec:
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec {name}, available codecs are {list(CODECS)}")
+    if name == "msgpack" and msgpack is None:
+        raise ImportError("The msgpack codec requires the msgpack package: `pip install msgpack`")
+    return CODECS[name]
+
+
+def recv_exactly(client: socket.socket, length: int) -> bytearray:
+    """Receive exactly `length` bytes from the socket in a preallocated buffer."""
+    buffer = bytearray(length)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        n_bytes = client.recv_into(view[received:], length - received)
+        if n_bytes == 0:
+            raise ConnectionError("Socket connection closed by the engine")
+        received += n_bytes
+    return buffer
+
+
+def recv_message(client: socket.socket) -> bytearray:
+    """Receive one length-prefixed message from the socket.
+
+    A new buffer is allocated for each message so that NumPy views returned by
+    decode_binary_frame stay valid after the next message is received.
+    """
+    while True:
+        (data_length,) = LENGTH_PREFIX.unpack(recv_exactly(client, LENGTH_PREFIX.size))
+        if data_length:
+            return recv_exactly(client, data_length)
+
+
+class SharedMemoryRing:
+    """A ring of fixed size slots in a shared memory segment in which the backend writes its replies.
+
+    The replies are not sent on the socket, but each one is copied out of its slot when decoded: the
+    decoded arrays don't depend on the shared memory and stay valid when the backend reuses the slot
+    or when the ring is closed.
+
+    Args:
+        n_slots: number of slots in the ring.
+        slot_size: size in bytes of each slot, i.e. the maximum size of a binary frame written in the ring.
+    """
+
+    def __init__(self, n_slots: int, slot_size: int):
+        self.n_slots = n_slots
+        self.slot_size = _align(slot_size)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.n_slots * self.slot_size)
+
+    def description(self) -> Dict:
+        """Description of the ring sent to the backend in the Initialize message."""
+        return {"name": self.shm.name, "n_slots": self.n_slots, "slot_size": self.slot_size}
+
+    def decode_slot(self, slot: int, nbytes: int) -> Dict:
+        if not 0 <= slot < self.n_slots or nbytes > self.slot_size:
+            raise ValueError(f"Invalid shared memory slot {slot} ({nbytes} bytes)")
+        start = slot * self.slot_size
+        with self.shm.buf[start : start + nbytes] as view:
+            data = bytearray(view)
+        return decode_message(data)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,310 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+""" Socket transport shared by the engines talking to a backend (Unity, Godot, Blender)."""
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from ..utils import logging
+from .instrumentation import LatencyRecorder
+from .protocol import LENGTH_PREFIX, Codec, JsonCodec, recv_exactly, recv_message
+
+
+logger = logging.get_logger(__name__)
+
+# Transports created by the current thread while tracked, with the deadline of their wait for the backend
+_startup = threading.local()
+
+
+@contextmanager
+def track_startup(deadline: Optional[float] = None) -> Iterator[List["EngineTransport"]]:
+    """Record the transports created in the current thread, e.g. by an environment started in a thread pool.
+
+    Args:
+        deadline: time.perf_counter() value after which the tracked transports stop waiting for their backend.
+
+    Yields:
+        transports: the list to which the transports are added when they are created.
+    """
+    _startup.deadline = deadline
+    _startup.transports = transports = []
+    try:
+        yield transports
+    finally:
+        _startup.deadline = _startup.transports = None
+
+
+class EngineTransport:
+    """Server socket to which a backend connects, with the length-prefixed message framing of the bridge.
+
+    Args:
+        transport: "tcp" or "unix" (Unix domain socket, for backends running on the same host which connect to the
+            `socket` bridge argument, e.g. the mock backend; the Unity build only supports "tcp").
+        host: host of the TCP server.
+        port: port of the TCP server, 0 lets the OS assign a free port.
+        socket_path: path of the Unix domain socket, a new temporary folder is used by default.
+        timeout: timeout in seconds of the operations on the connection to the backend, None to wait forever.
+        codec: codec used to encode the messages sent to the backend, JSON by default.
+    """
+
+    def __init__(
+        self,
+        transport: str = "tcp",
+        host: str = "127.0.0.1",
+        port: int = 55001,
+        socket_path: Optional[str] = None,
+        timeout: Optional[float] = None,
+        codec: Optional[Codec] = None,
+    ):
+        if transport not in ("tcp", "unix"):
+            raise ValueError("engine_transport must be 'tcp' or 'unix'")
+        if transport == "unix" and not hasattr(socket, "AF_UNIX"):
+            raise ValueError("Unix domain sockets are not available on this platform")
+        self.transport = transport
+        self.host = host if transport == "tcp" else None
+        self.port = port if transport == "tcp" else None
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.codec = codec if codec is not None else JsonCodec()
+        # Backend process launched to connect to this transport, terminated by abort()
+        self.process: Optional[subprocess.Popen] = None
+
+        self.socket = None
+        self.client = None
+        self.client_address = None
+        self._socket_dir = None
+
+        # Counters of the traffic on the connection
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+        # Optional latency histograms of the encode/send/wait/receive phases (None: not instrumented)
+        self.latency: Optional[LatencyRecorder] = None
+
+        self._deadline = getattr(_startup, "deadline", None)
+        tracked = getattr(_startup, "transports", None)
+        if tracked is not None:
+            tracked.append(self)
+
+    def listen(self, port_fallback: bool = False) -> List[str]:
+        """Bind the server socket and listen for the backend.
+
+        Args:
+            port_fallback: if the requested TCP port is already in use, use a port assigned by the OS instead.
+                Only possible when the backend is told the port (e.g. an executable we launch).
+
+        Returns:
+            bridge_args: the arguments telling a launched backend where to connect, e.g. ["port", "55001"].
+        """
+        if self.transport == "unix":
+            if self.socket_path is None:
+                self._socket_dir = tempfile.mkdtemp(prefix="simulate-")
+                self.socket_path = os.path.join(self._socket_dir, "engine.sock")
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.bind(self.socket_path)
+            bridge_args = ["socket", self.socket_path]
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                self.socket.bind((self.host, self.port))
+            except OSError as e:
+                if not port_fallback or self.port == 0:
+                    self.socket.close()
+                    raise OSError(f"Could not bind to {self.host}:{self.port}: {e}") from e
+                logger.info(f"Port {self.port} is already in use, using a port assigned by the OS.")
+                self.socket.bind((self.host, 0))
+            self.port = self.socket.getsockname()[1]
+            bridge_args = ["port", str(self.port)]
+        self.socket.listen()
+        logger.info(f"Starting the server. Waiting for connection on {self.address}...")
+        return bridge_args
+
+    @property
+    def address(self) -> str:
+        return self.socket_path if self.transport == "unix" else f"{self.host} {self.port}"
+
+    def accept(self, timeout: Optional[float] = None, engine_name: str = "engine"):
+        """Wait for the backend to connect.
+
+        Args:
+            timeout: timeout in seconds of the wait, default to the timeout of the transport (bounded by the
+                deadline of the startup tracking the transport was created in, if any).
+            engine_name: name of the backend in the error raised if it doesn't connect in time.
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        if self._deadline is not None:
+            remaining = max(self._deadline - perf_counter(), 0.0)
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        self.socket.settimeout(timeout)
+        try:
+            self.client, self.client_address = self.socket.accept()
+        except socket.timeout:
+            raise RuntimeError(f"The {engine_name} did not connect to {self.address} within {timeout:.3g}s") from None
+        self.client.settimeout(self.timeout)
+        logger.info(f"Connection from {self.client_address or self.address}")
+
+    def send_bytes(self, data: Union[bytes, bytearray]):
+        """Send an already framed message."""
+        self.client.sendall(data)
+        self.messages_sent += 1
+        self.bytes_sent += len(data)
+
+    def send(self, message: Dict, codec: Optional[Codec] = None):
+        """Encode and send a message with the given codec, by default the codec of the transport."""
+        if self.latency is None:
+            self.send_bytes((codec or self.codec).encode(message))
+            return
+        start = self.latency.now()
+        frame = (codec or self.codec).encode(message)
+        start = self.latency.record_since("encode", start)
+        self.send_bytes(frame)
+        self.latency.record_since("send", start)
+
+    def recv(self) -> bytearray:
+        """Receive the payload of the next message in a newly allocated buffer."""
+        if self.latency is None:
+            payload = recv_message(self.client)
+        else:
+            payload = self._recv_instrumented()
+        self.messages_received += 1
+        self.bytes_received += len(payload)
+        return payload
+
+    def _recv_instrumented(self) -> bytearray:
+        """recv_message split in the wait for the length prefix of the reply and the reception of its payload."""
+        start = self.latency.now()
+        data_length = 0
+        while not data_length:
+            (data_length,) = LENGTH_PREFIX.unpack(recv_exactly(self.client, LENGTH_PREFIX.size))
+        start = self.latency.record_since("wait", start)
+        payload = recv_exactly(self.client, data_length)
+        self.latency.record_since("receive", start)
+        return payload
+
+    def recv_decoded(self) -> Union[Dict, Any, str]:
+        """Receive and decode the next message, returned as a string if it can't be decoded."""
+        payload = self.recv()
+        try:
+            return self.codec.decode(payload)
+        except ValueError as e:
+            logger.warning(f"Exception loading response data: {e}")
+            return payload.decode(errors="replace")
+
+    @contextmanager
+    def _nonblocking(self) -> Iterator[socket.socket]:
+        """The client socket in non-blocking mode, as required by the socket methods of the asyncio event loop."""
+        self.client.settimeout(0)
+        try:
+            yield self.client
+        finally:
+            self.client.settimeout(self.timeout)
+
+    async def asend_bytes(self, data: Union[bytes, bytearray]):
+        """Send an already framed message without blocking the event loop."""
+        with self._nonblocking() as client:
+            await asyncio.wait_for(asyncio.get_running_loop().sock_sendall(client, data), self.timeout)
+        self.messages_sent += 1
+        self.bytes_sent += len(data)
+
+    async def asend(self, message: Dict, codec: Optional[Codec] = None):
+        """Encode and send a message without blocking the event loop."""
+        if self.latency is None:
+            await self.asend_bytes((codec or self.codec).encode(message))
+            return
+        start = self.latency.now()
+        frame = (codec or self.codec).encode(message)
+        start = self.latency.record_since("encode", start)
+        await self.asend_bytes(frame)
+        self.latency.record_since("send", start)
+
+    async def _arecv_exactly(self, length: int) -> bytearray:
+        loop = asyncio.get_running_loop()
+        buffer = bytearray(length)
+        view = memoryview(buffer)
+        received = 0
+        while received < length:
+            n_bytes = await loop.sock_recv_into(self.client, view[received:])
+            if n_bytes == 0:
+                raise ConnectionError("Socket connection closed by the engine")
+            received += n_bytes
+        return buffer
+
+    async def _arecv_message(self) -> bytearray:
+        start = self.latency.now() if self.latency is not None else None
+        data_length = 0
+        while not data_length:
+            (data_length,) = LENGTH_PREFIX.unpack(await self._arecv_exactly(LENGTH_PREFIX.size))
+        if self.latency is not None:
+            start = self.latency.record_since("wait", start)
+        payload = await self._arecv_exactly(data_length)
+        if self.latency is not None:
+            self.latency.record_since("receive", start)
+        return payload
+
+    async def arecv(self) -> bytearray:
+        """Receive the payload of the next message without blocking the event loop."""
+        with self._nonblocking():
+            payload = await asyncio.wait_for(self._arecv_message(), self.timeout)
+        self.messages_received += 1
+        self.bytes_received += len(payload)
+        return payload
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "messages_sent": self.messages_sent,
+            "messages_received": self.messages_received,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+        }
+
+    @property
+    def location(self) -> str:
+        """Where the backend connects, e.g. "port 55001" (the port actually bound)."""
+        return f"port {self.port}" if self.transport == "tcp" else f"socket {self.socket_path}"
+
+    def abort(self):
+        """Close the connection and terminate the launched backend process, e.g. after a failed startup."""
+        for sock in (self.client, self.socket):
+            if sock is not None:
+                try:
+                    # Unlike close(), shutdown() wakes up the threads blocked on the socket
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass  # Not connected
+        self.close()
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        if self.socket is not None:
+            self.socket.close()
+        if self.transport == "unix" and self.socket_path is not None:
+            if self._socket_dir is not None:
+                shutil.rmtree(self._socket_dir, ignore_errors=True)
+            elif os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
@@ -1,20 +1,37 @@
 import atexit
 import base64
-import json
+import hashlib
 import os
+import re
 import signal
 import socket
 import subprocess
 import tarfile
-import time
+import threading
+from collections import deque
 from sys import platform
-from typing import TYPE_CHECKING, Any, Dict, Optional, Union
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
 
+import numpy as np
+from filelock import FileLock
 from huggingface_hub import hf_hub_download
 from huggingface_hub.constants import hf_cache_home
 
 from ..utils import logging
 from .engine import Engine
+from .instrumentation import LatencyHistogram, LatencyRecorder
+from .protocol import (
+    CODECS,
+    FRAME_ALIGNMENT,
+    NODE_ARRAY_FIELDS,
+    PROTOCOL_VERSION,
+    Codec,
+    SharedMemoryRing,
+    decode_message,
+    get_codec,
+)
+from .transport import EngineTransport
 
 
 if TYPE_CHECKING:
@@ -25,9 +42,10 @@ if TYPE_CHECKING:
 logger = logging.get_logger(__name__)
 
 
-NUM_BIND_RETRIES = 20
-BIND_RETRIES_DELAY = 2.0
 SOCKET_TIME_OUT = 30.0  # Timeout in seconds
+SHARED_MEMORY_HEADER_SIZE = 65536  # Room left in each shared memory slot for the frame header
+# Keys of the timings of a reply which are timestamps of the backend clock and not durations
+TIMESTAMP_TIMINGS = ("received", "sent")
 
 UNITY_BUILD_REPO = "simulate-tests/unity-test"
 UNITY_SUBFOLDER = "builds"
@@ -52,6 +70,42 @@ elif platform == "win64":
 default_cache_path = os.path.join(hf_cache_home, "unity")
 
 HUGGINGFACE_UNITY_CACHE = os.getenv("HUGGINGFACE_UNITY_CACHE", default_cache_path)
+UNITY_EXTRACTED_MARKER = ".extracted"  # Written once a build is fully extracted, contains its main folder
+
+
+def _archive_hash(archive_path: str) -> str:
+    """Hash of an archive, the name of its blob when it is stored in the Hugging Face Hub cache."""
+    blob_name = os.path.basename(os.path.realpath(archive_path))
+    if re.fullmatch(r"[0-9a-f]{40}|[0-9a-f]{64}", blob_name):
+        return blob_name
+    sha256 = hashlib.sha256()
+    with open(archive_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def extract_unity_build(archive_path: str, cache_dir: str) -> str:
+    """Extract a Unity build archive in a folder of the cache named after its hash, return that folder's main folder.
+
+    A build is only extracted once: a lock file prevents concurrent processes (xdist workers, parallel
+    environments) from extracting the same archive simultaneously, and later calls reuse the extracted build.
+    """
+    extraction_dir = os.path.join(cache_dir, _archive_hash(archive_path))
+    marker_path = os.path.join(extraction_dir, UNITY_EXTRACTED_MARKER)
+    if not os.path.exists(marker_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        with FileLock(extraction_dir + ".lock"):
+            # Another process may have extracted the build while we were waiting for the lock
+            if not os.path.exists(marker_path):
+                logger.info(f"Extracting Unity build {archive_path} in {extraction_dir}")
+                with tarfile.open(archive_path) as archive:
+                    main_dir = os.path.commonpath(archive.getnames())
+                    archive.extractall(extraction_dir)
+                with open(marker_path, "w") as f:
+                    f.write(main_dir)
+    with open(marker_path) as f:
+        return os.path.join(extraction_dir, f.read())
 
 
 class UnityEngine(Engine):
@@ -59,20 +113,88 @@ class UnityEngine(Engine):
         self,
         scene: "Scene",
         auto_update: bool = True,
-        engine_exe: str = "",
+        engine_exe: Union[str, List[str]] = "",
         engine_host="127.0.0.1",
         engine_port: int = 55001,
         engine_headless: bool = False,
+        engine_transport: str = "tcp",
+        engine_socket_path: Optional[str] = None,
+        engine_protocol: str = "binary",
+        engine_shared_memory_slots: int = 0,
+        engine_shared_memory_slot_size: Optional[int] = None,
+        engine_max_in_flight: int = 1,
+        engine_node_arrays: bool = False,
     ):
         super().__init__(scene=scene, auto_update=auto_update)
 
-        self._initialize_server(
-            engine_exe=engine_exe, engine_host=engine_host, engine_port=engine_port, engine_headless=engine_headless
+        if engine_protocol not in CODECS:
+            raise ValueError(f"engine_protocol must be one of {list(CODECS)}")
+        if engine_transport == "unix" and engine_exe in ("", None, "debug"):
+            # The Unity build of the hub and the editor only connect to the `port` argument over TCP
+            raise ValueError(
+                "engine_transport='unix' is not supported by the Unity build or editor, only by executables "
+                "connecting to the `socket` argument (e.g. simulate.engine.mock_backend)"
+            )
+        if engine_shared_memory_slots and engine_protocol == "json":
+            raise ValueError("Shared memory replies require a binary engine_protocol ('binary' or 'msgpack')")
+        if engine_max_in_flight < 1:
+            raise ValueError("engine_max_in_flight must be at least 1")
+        if engine_shared_memory_slots and engine_shared_memory_slots <= engine_max_in_flight:
+            raise ValueError("engine_shared_memory_slots must be greater than engine_max_in_flight")
+        self.engine_protocol = engine_protocol
+        # Fails early if the codec can't be used, it is only used once acknowledged by the backend at the Handshake
+        get_codec(engine_protocol)
+        self._handshake_done = False
+
+        # Optional ring of shared memory slots in which the backend writes its replies (created at show())
+        self.shared_memory_slots = engine_shared_memory_slots
+        self.shared_memory_slot_size = engine_shared_memory_slot_size
+        self._shared_memory = None
+        self.shared_memory_fallbacks = 0  # Replies sent on the socket because they didn't fit in a slot
+
+        # Window of Step commands sent before their reply is read (negotiated with the backend at Initialize)
+        self.max_in_flight = engine_max_in_flight
+        self._max_in_flight = 1
+        self._next_sequence = 0
+        self._in_flight = deque()
+        self._completed = {}
+
+        # Node states returned as (n_nodes, size) arrays, with the table of the nodes fixed at show()
+        self.node_arrays = engine_node_arrays
+        self._node_arrays = False
+        self.node_names: Optional[List[str]] = None
+        self.node_index: Dict[str, int] = {}
+
+        # Scene changes made after show() and sent in one UpdateAssets command before the next step or reset
+        self._show_kwargs = None
+        self._shown_nodes = None
+        self._incremental_updates = False
+        self._updated_nodes: Dict[str, "Asset"] = {}
+        self._added_nodes: Dict[str, "Asset"] = {}
+        self._removed_nodes: Dict[str, None] = {}
+
+        # Timings reported by the backend in its replies (negotiated at Initialize), aggregated by stats()
+        self._engine_timings = False
+        self._send_times: Dict[int, float] = {}
+        self._timing_histograms: Dict[str, LatencyHistogram] = {}
+        self._min_wire_time = float("inf")
+        self.clock_offset: Optional[float] = None
+        self.last_timings: Optional[Dict[str, float]] = None
+
+        self.transport = EngineTransport(
+            transport=engine_transport,
+            host=engine_host,
+            port=engine_port,
+            socket_path=engine_socket_path,
+            timeout=SOCKET_TIME_OUT,
         )
+        self._initialize_server(engine_exe=engine_exe, engine_headless=engine_headless)
 
         atexit.register(self._close)
-        signal.signal(signal.SIGTERM, self._close)
-        signal.signal(signal.SIGINT, self._close)
+        if threading.current_thread() is threading.main_thread():
+            # Signal handlers can only be set from the main thread (engines can be created in a thread pool)
+            signal.signal(signal.SIGTERM, self._close)
+            signal.signal(signal.SIGINT, self._close)
 
         self._map_pool = False
 
@@ -86,107 +208,383 @@ class UnityEngine(Engine):
             repo_type="space",
         )
 
-        # open file
-        archive = tarfile.open(unity_compressed)
-        main_dir = os.path.commonpath(archive.getnames())
+        main_dir = extract_unity_build(unity_compressed, HUGGINGFACE_UNITY_CACHE)
+        return os.path.join(main_dir, UNITY_EXECUTABLE_PATH)
 
-        archive.extractall(HUGGINGFACE_UNITY_CACHE)
-        archive.close()
-        return os.path.join(HUGGINGFACE_UNITY_CACHE, main_dir, UNITY_EXECUTABLE_PATH)
-
-    def _launch_executable(self, executable: str, port: str, headless: bool):
+    def _launch_executable(self, executable: Union[str, List[str]], bridge_args: List[str], headless: bool):
+        # An argument list is used as is, paths with spaces (e.g. of the interpreter) must be given this way
+        command = executable.split(" ") if isinstance(executable, str) else list(executable)
         # TODO: improve headless training check on a headless machine
         if headless:
             logger.info("launching env headless")
-            launch_command = f"{executable} -batchmode -nographics --args port {port}".split(" ")
+            launch_command = command + ["-batchmode", "-nographics", "--args", *bridge_args]
         else:
-            launch_command = f"{executable} --args port {port}".split(" ")
+            launch_command = command + ["--args", *bridge_args]
         environ = os.environ.copy()
         environ["PATH"] = "/usr/sbin:/sbin:" + environ["PATH"]
 
         self.proc = subprocess.Popen(launch_command, env=environ)
+        self.transport.process = self.proc
 
-    @staticmethod
-    def _find_port_number(starting_engine_port: int) -> int:
-        """use a different port in each xdist worker"""
-        port_tests = list(range(starting_engine_port, starting_engine_port + 1024))
-        for port in port_tests:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                if s.connect_ex(("localhost", port)) == 0:
-                    continue
-                else:
-                    return port
-        raise RuntimeError("Could not find a free port")
-
-    def _initialize_server(self, engine_exe: str, engine_host: str, engine_port: int, engine_headless: bool):
+    def _initialize_server(self, engine_exe: Union[str, List[str]], engine_headless: bool):
         """Initialize the local server and launch the Unity executable and
         connect to it.
         """
-        # Initializing on our side
-        self.host = engine_host
-        self.port = self._find_port_number(engine_port)
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        logger.info(f"Starting the server. Waiting for connection on {self.host} {self.port}...")
-        try:
-            self.socket.bind((self.host, self.port))
-        except OSError:
-            for n in range(NUM_BIND_RETRIES):
-                time.sleep(BIND_RETRIES_DELAY)
-                try:
-                    self.socket.bind((self.host, self.port))
-                    break
-                except OSError:
-                    logger.error(f"port {self.port} is still in use, trying again")
-            raise logger.error(f"Could not bind to port {self.port}")
-
-        self.socket.listen()
+        is_command = isinstance(engine_exe, (list, tuple)) and all(isinstance(arg, str) for arg in engine_exe)
+        if engine_exe is not None and not isinstance(engine_exe, str) and not is_command:
+            raise ValueError("engine_exe must be a string, a list of command arguments, None or empty")
+        # With the editor (debug mode) the port is the one set in the editor, it can't be changed
+        launch_executable = engine_exe not in (None, "debug")
+
+        # Initializing on our side, a launched executable is told the address actually bound
+        bridge_args = self.transport.listen(port_fallback=launch_executable)
 
         # Starting the Unity executable
         logger.info(f"Starting Unity executable {engine_exe}...")
-        if engine_exe is None or engine_exe == "debug":
+        if not launch_executable:
             pass  # We run with the editor
-        elif engine_exe:
-            self._launch_executable(executable=engine_exe, port=str(engine_port), headless=engine_headless)
-        elif engine_exe == "":
-            engine_exe = self._get_unity_from_hub()
-            self._launch_executable(executable=engine_exe, port=str(engine_port), headless=engine_headless)
         else:
-            raise ValueError("engine_exe must be a string, None or empty")
+            if engine_exe == "":
+                engine_exe = self._get_unity_from_hub()
+            self._launch_executable(executable=engine_exe, bridge_args=bridge_args, headless=engine_headless)
 
         # Connecting both
-        logger.info(f"Connecting to Unity executable on {self.host} {self.port}...")
-        self.client, self.client_address = self.socket.accept()
-        # self.client.setblocking(0)  # Set to non-blocking
-        self.client.settimeout(SOCKET_TIME_OUT)  # Set a timeout
-        logger.info(f"Connection from {self.client_address}")
-
-    def _get_response(self) -> str:
-        while True:
+        logger.info(f"Connecting to Unity executable on {self.transport.address}...")
+        try:
+            self.transport.accept(
+                engine_name=f"Unity executable {engine_exe}" if launch_executable else "Unity editor"
+            )
+        except Exception:
+            self.transport.abort()
+            raise
+
+    @property
+    def client(self) -> socket.socket:
+        """The socket connected to the backend."""
+        return self.transport.client
+
+    @property
+    def host(self) -> Optional[str]:
+        return self.transport.host
+
+    @property
+    def port(self) -> Optional[int]:
+        return self.transport.port
+
+    @property
+    def socket_path(self) -> Optional[str]:
+        return self.transport.socket_path
+
+    @property
+    def codec(self) -> str:
+        """Name of the codec of the messages, as acknowledged by the backend."""
+        return self.transport.codec.name
+
+    @property
+    def binary_protocol(self) -> bool:
+        """Whether the backend acknowledged a binary codec (NumPy arrays are sent as raw buffers)."""
+        return self.transport.codec.name != "json"
+
+    def _handshake(self, codec: str) -> Codec:
+        """Request a codec and incremental scene updates, return the codec acknowledged by the backend.
+
+        Backends which don't know the Handshake command answer with an error string: JSON messages are used,
+        without incremental updates. Backends which support binary frames but not the requested codec reply
+        without acknowledging it.
+        """
+        handshake = {"type": "Handshake", "incremental_updates": True}
+        if codec != "json":
+            handshake["binary_protocol"] = PROTOCOL_VERSION
+        if codec not in ("json", "binary"):
+            handshake["codec"] = codec
+        self.transport.send(handshake, codec=get_codec("json"))
+        try:
+            response = decode_message(self._get_response())
+        except ValueError:
+            response = None
+        self._incremental_updates = isinstance(response, dict) and bool(response.get("incremental_updates"))
+        if codec == "json":
+            return get_codec("json")
+        if not isinstance(response, dict) or response.get("binary_protocol") != PROTOCOL_VERSION:
+            logger.info("Engine did not acknowledge the binary protocol, falling back to JSON messages.")
+            return get_codec("json")
+        if codec != "binary" and response.get("codec") != codec:
+            logger.info(f"Engine did not acknowledge the {codec} codec, falling back to binary frames.")
+            return get_codec("binary")
+        return get_codec(codec)
+
+    @property
+    def latency(self) -> Optional[LatencyRecorder]:
+        """Latency histograms of the phases of the commands, None if the instrumentation is disabled."""
+        return self.transport.latency
+
+    def enable_latency_instrumentation(
+        self, callback: Optional[Callable[[str, float], None]] = None, buckets: Optional[List[float]] = None
+    ) -> LatencyRecorder:
+        """Record the duration of each phase of the commands (encode, send, wait, receive, decode) in histograms.
 
-            data_length = self.client.recv(4)
-            data_length = int.from_bytes(data_length, "little")
+        Args:
+            callback: called with (phase, seconds) for each recorded duration.
+            buckets: upper bounds in seconds of the histogram buckets.
 
-            if data_length:
-                response = ""  # TODO: string concatenation may be slow
-                while len(response) < data_length:
-                    response += self.client.recv(data_length - len(response)).decode()
+        Returns:
+            recorder (LatencyRecorder): the histograms, exported with `recorder.as_dict()`.
+        """
+        self.transport.latency = LatencyRecorder(callback=callback, buckets=buckets)
+        return self.transport.latency
 
-                return response
+    def disable_latency_instrumentation(self):
+        self.transport.latency = None
 
-    def update_asset(self, root_node: "Asset"):
-        # TODO update and make this API more consistent with all the
-        # update_asset, update, show
-        raise NotImplementedError()
+    def _record_timings(self, response: Union[Dict, str], sent_at: float, received_at: float):
+        """Split the round trip of a command in wire and engine time with the timings reported in its reply.
 
-    def update_all_assets(self):
-        raise NotImplementedError()
+        The reply carries {"timings": {"received": t, "sent": t, "physics": s, "render": s, "sensors": s, ...}}
+        where received/sent are timestamps of the backend clock and the other fields are durations in seconds.
+        The offset between the backend clock and perf_counter() is estimated from the round trip with the
+        smallest wire time (as in NTP).
+        """
+        timings = response.pop("timings", None) if isinstance(response, dict) else None
+        if not isinstance(timings, dict):
+            return
+        self.last_timings = timings
+        durations = {"round_trip": received_at - sent_at}
+        if "received" in timings and "sent" in timings:
+            durations["engine"] = timings["sent"] - timings["received"]
+            durations["wire"] = durations["round_trip"] - durations["engine"]
+            if durations["wire"] < self._min_wire_time:
+                self._min_wire_time = durations["wire"]
+                self.clock_offset = ((timings["received"] - sent_at) + (timings["sent"] - received_at)) / 2
+        durations.update({key: value for key, value in timings.items() if key not in TIMESTAMP_TIMINGS})
+        for key, value in durations.items():
+            histogram = self._timing_histograms.get(key)
+            if histogram is None:
+                histogram = self._timing_histograms[key] = LatencyHistogram()
+            histogram.record(value)
+
+    def to_client_time(self, backend_time: float) -> float:
+        """Convert a timestamp of the backend clock to the perf_counter() clock of this process."""
+        if self.clock_offset is None:
+            raise RuntimeError("The backend did not report timings, its clock can't be aligned")
+        return backend_time - self.clock_offset
+
+    def stats(self) -> Dict[str, Any]:
+        """Aggregated statistics of the bridge.
+
+        Returns:
+            stats (dict): the traffic on the connection ("transport"), whether the backend reports its timings
+                ("engine_timings"), the histograms of the round trips of the commands and of their split in
+                wire and engine time (physics, render, sensors...) as reported by the backend ("timings"),
+                the offset between the backend clock and perf_counter() ("clock_offset"), the number of
+                replies sent on the socket while a shared memory ring is used ("shared_memory_fallbacks") and,
+                if enabled, the latency histograms of the phases of the commands ("latency").
+        """
+        stats = {
+            "transport": self.transport.stats(),
+            "engine_timings": self._engine_timings,
+            "timings": {key: histogram.as_dict() for key, histogram in self._timing_histograms.items()},
+            "clock_offset": self.clock_offset,
+            "shared_memory_fallbacks": self.shared_memory_fallbacks,
+        }
+        if self.latency is not None:
+            stats["latency"] = self.latency.as_dict()
+        return stats
+
+    def _get_response(self) -> bytearray:
+        return self.transport.recv()
+
+    def _decode_response(self, response: bytearray) -> Union[Dict, str]:
+        latency = self.transport.latency
+        start = latency.now() if latency is not None else None
+        try:
+            message = decode_message(response)
+            if self._shared_memory is not None and isinstance(message, dict) and "shared_memory_slot" in message:
+                # The reply was written in shared memory, the socket only carried its location
+                message = self._shared_memory.decode_slot(message["shared_memory_slot"], message["nbytes"])
+            elif self._shared_memory is not None:
+                if not self.shared_memory_fallbacks:
+                    logger.warning(
+                        f"A reply of {len(response)} bytes didn't fit in the shared memory slots of "
+                        f"{self._shared_memory.slot_size} bytes and was sent on the socket, "
+                        "set engine_shared_memory_slot_size to a larger size."
+                    )
+                self.shared_memory_fallbacks += 1
+        except Exception as e:
+            logger.warning(f"Exception loading response data: {e}")
+            return response.decode(errors="replace")
+        if latency is not None:
+            latency.record_since("decode", start)
+        return message
+
+    def _shared_memory_slot_size(self) -> int:
+        """Estimate the size of a step reply from the observation spaces of the actors in the scene.
+
+        A step ending episodes carries the observations twice (the new ones and the terminal ones), and the
+        node states are added when they are returned as arrays. Replies which don't fit in a slot are still
+        sent on the socket, they are counted in `stats()["shared_memory_fallbacks"]`.
+        """
+        if self.shared_memory_slot_size is not None:
+            return self.shared_memory_slot_size
+        float_size = np.dtype(np.float32).itemsize
+        slot_size = SHARED_MEMORY_HEADER_SIZE
+        for actor in self._scene.actors:
+            observation_space = actor.observation_space
+            for space in getattr(observation_space, "spaces", {}).values():
+                # Observations and terminal observations
+                slot_size += 2 * (int(np.prod(space.shape)) * np.dtype(space.dtype).itemsize + FRAME_ALIGNMENT)
+            slot_size += 3 * (float_size + FRAME_ALIGNMENT)  # reward, done and truncated
+        if self.node_arrays:
+            n_nodes = len(self.node_names)
+            slot_size += sum(n_nodes * size * float_size + FRAME_ALIGNMENT for size in NODE_ARRAY_FIELDS.values())
+        return slot_size
+
+    def _send_command(self, command: str, **kwargs: Any):
+        self.transport.send({"type": command, **kwargs})
+
+    def _glb_payload(self, bytes_data: bytes) -> Dict:
+        """GLB bytes as a raw buffer with a binary codec or as a base64 string otherwise."""
+        if self.binary_protocol:
+            return {"bytes": np.frombuffer(bytes_data, dtype=np.uint8)}
+        return {"b64bytes": base64.b64encode(bytes_data).decode("ascii")}
+
+    @property
+    def has_pending_updates(self) -> bool:
+        """Whether changes made to the scene since show() still have to be sent to the backend."""
+        return bool(self._updated_nodes or self._added_nodes or self._removed_nodes)
+
+    def update_asset(self, asset_node: "Asset"):
+        """Queue the new transform of an asset, sent with the next update_all_assets()."""
+        if self._shown_nodes is None or asset_node.name in self._added_nodes:
+            return  # Not shown yet or already sent as a whole
+        if asset_node.name in self._shown_nodes:
+            self._check_incremental_updates()
+            self._updated_nodes[asset_node.name] = asset_node
+
+    def add_asset(self, asset_node: "Asset"):
+        """Queue an asset attached to the scene, sent as a GLB fragment with the next update_all_assets()."""
+        if self._shown_nodes is None or any(node.name in self._added_nodes for node in asset_node.tree_ancestors):
+            return  # Not shown yet or part of a sub-tree which will be sent as a whole
+        self._check_incremental_updates()
+        for node in asset_node.tree_descendants:
+            self._added_nodes.pop(node.name, None)
+        self._added_nodes[asset_node.name] = asset_node
+
+    def remove_asset(self, asset_node: "Asset"):
+        """Queue the removal of an asset and all its children, sent with the next update_all_assets()."""
+        if self._shown_nodes is None:
+            return
+        if any(node.name in self._shown_nodes for node in (asset_node,) + asset_node.tree_descendants):
+            self._check_incremental_updates()
+        shown = False
+        for node in (asset_node,) + asset_node.tree_descendants:
+            self._updated_nodes.pop(node.name, None)
+            self._added_nodes.pop(node.name, None)
+            if node.name in self._shown_nodes:
+                self._shown_nodes.discard(node.name)
+                shown = True
+        if shown:
+            self._removed_nodes[asset_node.name] = None
+
+    def _check_incremental_updates(self):
+        """Raise at the modification of a shown scene if the backend can't receive the change."""
+        if not self._incremental_updates:
+            raise NotImplementedError(
+                "The engine does not support incremental scene updates, the scene can't be modified after show(). "
+                "Close the scene and show it in a new engine to apply the changes."
+            )
+
+    def _scene_updates(self) -> Dict:
+        """Build the UpdateAssets message from the queued scene changes."""
+        nodes = {
+            name: {
+                "position": np.asarray(node.position).tolist(),
+                "rotation": np.asarray(node.rotation).tolist(),
+                "scaling": np.asarray(node.scaling).tolist(),
+            }
+            for name, node in self._updated_nodes.items()
+        }
+        added = {
+            name: {"parent": node.tree_parent.name, **self._glb_payload(node.as_glb_bytes())}
+            for name, node in self._added_nodes.items()
+        }
+        return {"removed": list(self._removed_nodes), "added": added, "nodes": nodes}
+
+    def update_all_assets(self) -> Optional[Union[Dict, str]]:
+        """Send the changes made to the scene since the last update in one UpdateAssets command.
+
+        Only the new transforms of the modified nodes, the names of the removed nodes and the newly added
+        sub-trees (as GLB fragments) are sent. Backends which did not acknowledge incremental updates at the
+        Handshake can't receive changes once the scene is shown: the modifications raise a NotImplementedError
+        as soon as they are made and nothing is queued.
+        """
+        if not self.has_pending_updates:
+            return None
+        return self.run_command("UpdateAssets", **self._pop_scene_updates())
+
+    async def aupdate_all_assets(self) -> Optional[Union[Dict, str]]:
+        """Send the changes made to the scene without blocking the event loop (see update_all_assets)."""
+        if not self.has_pending_updates:
+            return None
+        return await self.arun_command("UpdateAssets", **self._pop_scene_updates())
+
+    def _pop_scene_updates(self) -> Dict:
+        """Build the UpdateAssets message and clear the queued changes, the added nodes are now shown."""
+        updates = self._scene_updates()
+        for node in self._added_nodes.values():
+            self._shown_nodes.update(n.name for n in (node,) + node.tree_descendants)
+        self._updated_nodes.clear()
+        self._added_nodes.clear()
+        self._removed_nodes.clear()
+        return updates
 
     def show(self, **kwargs: Any) -> Union[Dict, str]:
+        self._show_kwargs = dict(kwargs)
+        self._shown_nodes = {node.name for node in (self._scene,) + self._scene.tree_descendants}
+        self._updated_nodes.clear()
+        self._added_nodes.clear()
+        self._removed_nodes.clear()
+
+        if self._handshake_done is False:
+            self.transport.codec = self._handshake(self.engine_protocol)
+            self._handshake_done = True
+
+        # With a binary codec the GLB scene is sent as a raw buffer in the Initialize message
         bytes_data = self._scene.as_glb_bytes()
-        b64_bytes = base64.b64encode(bytes_data).decode("ascii")
-        kwargs.update({"b64bytes": b64_bytes})
-        return self.run_command("Initialize", **kwargs)
+        kwargs.update(self._glb_payload(bytes_data))
+        # The table of the node arrays is known before the size of the shared memory slots is estimated
+        if self.node_arrays:
+            node_filter = self._scene.config.node_filter
+            if node_filter:
+                self.node_names = list(node_filter)
+            else:
+                self.node_names = [node.name for node in self._scene.tree_descendants]
+            self.node_index = {name: index for index, name in enumerate(self.node_names)}
+            kwargs.update({"node_arrays": {"names": self.node_names}})
+        self._close_shared_memory()
+        ring = None
+        if self.shared_memory_slots and self.binary_protocol:
+            ring = SharedMemoryRing(self.shared_memory_slots, self._shared_memory_slot_size())
+            kwargs.update({"shared_memory": ring.description()})
+
+        if self.max_in_flight > 1:
+            kwargs.update({"max_in_flight": self.max_in_flight})
+        self._max_in_flight = 1
+        kwargs.update({"timings": True})
+        if self._incremental_updates:
+            kwargs.update({"incremental_updates": True})
+
+        response = self.run_command("Initialize", **kwargs)
+        if ring is not None:
+            if isinstance(response, dict) and response.get("shared_memory"):
+                self._shared_memory = ring
+            else:
+                logger.info("Engine did not acknowledge the shared memory ring, replies are sent on the socket.")
+                ring.close()
+        if self.max_in_flight > 1 and isinstance(response, dict):
+            self._max_in_flight = max(1, min(int(response.get("max_in_flight", 1)), self.max_in_flight))
+        self._engine_timings = isinstance(response, dict) and bool(response.get("timings"))
+        self._node_arrays = isinstance(response, dict) and bool(response.get("node_arrays"))
+        return response
 
     def step(self, action: Optional[Dict] = None, **kwargs: Any) -> Union[Dict, str]:
         """Step the environment with the given action.
@@ -198,54 +596,183 @@ class UnityEngine(Engine):
         """
         if action is not None:
             kwargs.update({"action": action})
+        self.update_all_assets()
         return self.run_command("Step", **kwargs)
 
-    def step_send_async(self, **kwargs: Any):
-        self.run_command_async("Step", **kwargs)
-
-    def step_recv_async(self) -> str:
-        return self.get_response_async()
+    def get_node_arrays(self, event: Dict) -> Dict[str, np.ndarray]:
+        """The states of the nodes of the table `node_names` in a step reply, as (n_nodes, size) float32 arrays.
 
-    def reset(self):
+        Row i of each array ("position", "rotation", "velocity" and "angular_velocity") is the state of the node
+        `node_names[i]`, NaN if it is not in the reply. If the backend doesn't send the node arrays, they are
+        built from the node dictionaries of the reply.
+        """
+        if self.node_names is None:
+            raise RuntimeError("Node arrays are only available with engine_node_arrays=True, after show()")
+        node_arrays = event.get("node_arrays")
+        if isinstance(node_arrays, dict):
+            return node_arrays
+
+        node_arrays = {
+            field: np.full((len(self.node_names), size), np.nan, dtype=np.float32)
+            for field, size in NODE_ARRAY_FIELDS.items()
+        }
+        for name, data in event.get("nodes", {}).items():
+            index = self.node_index.get(name)
+            if index is None:
+                continue
+            for field, array in node_arrays.items():
+                if data.get(field) is not None:
+                    array[index] = data[field]
+        return node_arrays
+
+    def step_send_async(self, **kwargs: Any) -> int:
+        """Send a Step command without waiting for its reply.
+
+        Up to `engine_max_in_flight` steps (as acknowledged by the backend) can be sent before reading
+        their replies, when the window is full the oldest reply is received and kept for step_recv_async.
+
+        Returns:
+            sequence (int): the sequence number of the step, to give to step_recv_async.
+        """
+        self.update_all_assets()
+        while len(self._in_flight) >= self._max_in_flight:
+            self._receive_in_flight()
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        if self._max_in_flight > 1:
+            kwargs.update({"sequence": sequence})
+        # Timestamped by sequence number, its round trip is recorded when its reply is received
+        self._send_times[sequence] = perf_counter()
+        self.run_command_async("Step", **kwargs)
+        self._in_flight.append(sequence)
+        return sequence
+
+    def step_recv_async(self, sequence: Optional[int] = None) -> Union[Dict, str]:
+        """Return the reply of a step sent with step_send_async (by default the oldest one not returned yet)."""
+        if sequence is None:
+            pending = list(self._completed) + list(self._in_flight)
+            if not pending:
+                raise RuntimeError("No step was sent with step_send_async")
+            sequence = min(pending)
+        elif sequence not in self._completed and sequence not in self._in_flight:
+            raise ValueError(f"No step with sequence number {sequence} is pending")
+        while sequence not in self._completed:
+            self._receive_in_flight()
+        return self._completed.pop(sequence)
+
+    def step_reply_ready(self) -> bool:
+        """Whether the reply of the oldest pending step was already received, step_recv_async then returns it
+        without reading the socket (replies are received early when the window of steps in flight is full or
+        before running another command).
+        """
+        pending = list(self._completed) + list(self._in_flight)
+        return bool(pending) and min(pending) in self._completed
+
+    def _receive_in_flight(self):
+        """Receive the next step reply and store it with its sequence number."""
+        data = self._get_response()
+        self._store_in_flight_reply(data, perf_counter())
+
+    async def _areceive_in_flight(self):
+        data = await self.transport.arecv()
+        self._store_in_flight_reply(data, perf_counter())
+
+    def _store_in_flight_reply(self, data: bytearray, received_at: float):
+        response = self._decode_response(data)
+        if isinstance(response, dict) and "sequence" in response:
+            sequence = response.pop("sequence")
+            self._in_flight.remove(sequence)
+        else:
+            # Replies come back in the order of the commands
+            sequence = self._in_flight.popleft()
+        sent_at = self._send_times.pop(sequence)
+        if self._engine_timings:
+            self._record_timings(response, sent_at, received_at)
+        if self.transport.latency is not None:
+            self.transport.latency.record("command/Step", received_at - sent_at)
+        self._completed[sequence] = response
+
+    def reset(self, seed: Optional[int] = None):
+        """Reset the scene, the optional seed is forwarded to the backend (ignored by those without seeding)."""
+        self.update_all_assets()
+        if seed is not None:
+            return self.run_command("Reset", seed=seed)
         return self.run_command("Reset")
 
     def run_command(self, command: str, wait_for_response: bool = True, **kwargs: Any) -> Union[Dict, str]:
-        message = json.dumps({"type": command, **kwargs})
-        message_bytes = len(message).to_bytes(4, "little") + bytes(message.encode())
-        self.client.sendall(message_bytes)
-        if wait_for_response:
-            response = self._get_response()
-            try:
-                return json.loads(response)
-            except Exception as e:
-                logger.warning(f"Exception loading response json data: {e}")
-                return response
+        # The replies of the steps still in flight come before the reply of this command
+        while self._in_flight:
+            self._receive_in_flight()
+        sent_at = perf_counter()
+        self._send_command(command, **kwargs)
+        if not wait_for_response:
+            return None
+        data = self._get_response()
+        received_at = perf_counter()
+        response = self._decode_response(data)
+        if self._engine_timings:
+            self._record_timings(response, sent_at, received_at)
+        if self.transport.latency is not None:
+            self.transport.latency.record_since(f"command/{command}", sent_at)
+        return response
+
+    async def astep(self, action: Optional[Dict] = None, **kwargs: Any) -> Union[Dict, str]:
+        """Step the environment with the given action, without blocking the event loop (see step)."""
+        if action is not None:
+            kwargs.update({"action": action})
+        await self.aupdate_all_assets()
+        return await self.arun_command("Step", **kwargs)
+
+    async def areset(self, seed: Optional[int] = None) -> Union[Dict, str]:
+        await self.aupdate_all_assets()
+        if seed is not None:
+            return await self.arun_command("Reset", seed=seed)
+        return await self.arun_command("Reset")
+
+    async def arun_command(self, command: str, **kwargs: Any) -> Union[Dict, str]:
+        """Send a command and wait for its reply without blocking the event loop.
+
+        Several engines can be driven concurrently from one event loop, e.g. with asyncio.gather. Commands
+        sent to the same engine must not overlap: await each one before sending the next.
+        """
+        while self._in_flight:
+            await self._areceive_in_flight()
+        sent_at = perf_counter()
+        await self.transport.asend({"type": command, **kwargs})
+        data = await self.transport.arecv()
+        received_at = perf_counter()
+        response = self._decode_response(data)
+        if self._engine_timings:
+            self._record_timings(response, sent_at, received_at)
+        if self.transport.latency is not None:
+            self.transport.latency.record_since(f"command/{command}", sent_at)
+        return response
 
     def run_command_async(self, command: str, **kwargs: Any):
-        message = json.dumps({"type": command, **kwargs})
-        message_bytes = len(message).to_bytes(4, "little") + bytes(message.encode())
-        self.client.sendall(message_bytes)
+        self._send_command(command, **kwargs)
 
     def get_response_async(self) -> Union[Dict, str]:
-        response = self._get_response()
-        try:
-            return json.loads(response)
-        except Exception as e:
-            logger.warning(f"Exception loading response json data: {e}")
-            return response
+        return self._decode_response(self._get_response())
 
     def _close(self):
         self.close()
 
+    def _close_shared_memory(self):
+        if self._shared_memory is not None:
+            self._shared_memory.close()
+            self._shared_memory = None
+
     def close(self):
         try:
             self.run_command("Close", wait_for_response=False)
         except Exception as e:
             logger.error(f"Exception sending close message: {e}")
 
-        # self.client.shutdown(socket.SHUT_RDWR)
-        self.client.close()
-        self.socket.close()
+        self.transport.close()
+        self._in_flight.clear()
+        self._completed.clear()
+        self._send_times.clear()
+        self._close_shared_memory()
 
         try:
             atexit.unregister(self._close)
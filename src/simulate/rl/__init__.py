@@ -1,2 +1,4 @@
 from .parallel_rl_env import ParallelRLEnv
 from .rl_env import RLEnv
+from .subproc_rl_env import SubprocParallelRLEnv
+from .vector_env import VectorRLEnv
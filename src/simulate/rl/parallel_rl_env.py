@@ -12,19 +12,31 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import selectors
 from collections import defaultdict
-from typing import Any, Callable, List, Optional, Sequence, Type
+from concurrent import futures
+from time import perf_counter
+from typing import Any, Callable, List, Optional, Tuple, Type
 
 import gym
 import numpy as np
 
+from ..engine.transport import track_startup
+from ..engine.unity_engine import SOCKET_TIME_OUT
+from .rl_env import get_env_indices
+
 
 try:
     from stable_baselines3.common.vec_env.base_vec_env import VecEnv, VecEnvIndices
 except ImportError:
 
     class VecEnv:
-        pass  # Dummy class if SB3 is not installed
+        # Dummy class if SB3 is not installed
+        def __init__(self, num_envs: int, observation_space: gym.spaces.Space, action_space: gym.spaces.Space):
+            self.num_envs = num_envs
+            self.observation_space = observation_space
+            self.action_space = action_space
 
     class VecEnvIndices:
         pass  # Dummy class if SB3 is not installed
@@ -40,25 +52,109 @@ class ParallelRLEnv(VecEnv):
         env_fn (`Callable`): a generator function that returns a RLEnv for generating instances of the desired environment.
         n_parallel (`int`): the number of executable instances to create.
         starting_port (`int): initial communication port for spawned executables.
+        inplace_buffers (`bool`): if True, observations, rewards and dones are written in arrays owned by the
+            environment and the same arrays are returned at each step (copy them if you need to keep them).
+        parallel_startup (`bool`): if True, the environments are created concurrently in a thread pool, so that
+            the executables boot, connect and receive their scene at the same time.
+        startup_timeout (`float`, optional): with parallel_startup, the maximum time in seconds to wait for all
+            the environments to be created.
     """
 
-    def __init__(self, env_fn: Callable, n_parallel: int, starting_port: int = 55001):
+    def __init__(
+        self,
+        env_fn: Callable,
+        n_parallel: int,
+        starting_port: int = 55001,
+        inplace_buffers: bool = False,
+        parallel_startup: bool = False,
+        startup_timeout: Optional[float] = None,
+    ):
         self.n_parallel = n_parallel
-        self.envs = []
-        observation_space = None
-        action_space = None
 
         # create the environments
-        for i in range(n_parallel):
-            env = env_fn(starting_port + i)
-            self.n_show = env.n_show
-            observation_space = env.observation_space
-            action_space = env.action_space
-            self.envs.append(env)
-
-        num_envs = self.n_show * self.n_parallel
+        if parallel_startup:
+            self.envs = self._start_envs(env_fn, n_parallel, starting_port, startup_timeout)
+        else:
+            self.envs = [env_fn(starting_port + i) for i in range(n_parallel)]
+        self.n_show = self.envs[-1].n_show
+        self.n_actors_per_map = self.envs[-1].n_actors_per_map
+        # Rows of the batch arrays of each environment (one per actor of the maps shown)
+        self.n_rows_per_env = self.envs[-1].num_envs
+        observation_space = self.envs[-1].observation_space
+        action_space = self.envs[-1].action_space
+
+        num_envs = self.n_rows_per_env * self.n_parallel
         super().__init__(num_envs, observation_space, action_space)
 
+        # Replies are gathered in the order they arrive rather than in the order of the environments
+        self._selector = selectors.DefaultSelector()
+        for i, env in enumerate(self.envs):
+            self._selector.register(env.scene.engine.client, selectors.EVENT_READ, data=i)
+
+        self.inplace_buffers = inplace_buffers
+        if inplace_buffers:
+            self._create_buffers()
+
+    @staticmethod
+    def _start_envs(
+        env_fn: Callable, n_parallel: int, starting_port: int, startup_timeout: Optional[float]
+    ) -> List[Any]:
+        """
+        Create the environments in a thread pool, close them all and report each failure if one can't start.
+        The transports created by each environment are tracked: they stop waiting for their executable at the
+        startup deadline, and are closed (terminating their executable) if the startup fails.
+        """
+        deadline = perf_counter() + startup_timeout if startup_timeout is not None else None
+        transports = [[] for _ in range(n_parallel)]
+
+        def start_env(i: int) -> Any:
+            with track_startup(deadline) as transports[i]:
+                return env_fn(starting_port + i)
+
+        executor = futures.ThreadPoolExecutor(max_workers=n_parallel, thread_name_prefix="ParallelRLEnv")
+        env_futures = [executor.submit(start_env, i) for i in range(n_parallel)]
+        done, _ = futures.wait(env_futures, timeout=startup_timeout)
+        executor.shutdown(wait=False)
+
+        errors = []
+        for i, future in enumerate(env_futures):
+            location = transports[i][-1].location if transports[i] else f"port {starting_port + i}"
+            if future not in done:
+                errors.append(f"environment {i} ({location}): not started after {startup_timeout}s")
+            elif future.exception() is not None:
+                errors.append(f"environment {i} ({location}): {future.exception()!r}")
+        if errors:
+            for future in env_futures:
+                # Environments which started (or will start later) are closed
+                future.add_done_callback(lambda f: f.exception() is None and f.result().close())
+            for env_transports in transports:
+                # Unblocks the environments still starting and terminates their executables
+                for transport in env_transports:
+                    transport.abort()
+            raise RuntimeError("Could not start all the environments:\n" + "\n".join(errors))
+        return [future.result() for future in env_futures]
+
+    def _create_buffers(self):
+        """Allocate the batch arrays once and give each environment a view on its slice."""
+        n_rows = [env.num_envs for env in self.envs]
+        n_total = sum(n_rows)
+        self._obs_buffers = {
+            key: np.zeros((n_total, *space.shape), dtype=space.dtype)
+            for key, space in self.observation_space.spaces.items()
+        }
+        self._reward_buffer = np.zeros(n_total, dtype=np.float32)
+        self._done_buffer = np.zeros(n_total, dtype=np.float32)
+
+        start = 0
+        for env, rows in zip(self.envs, n_rows):
+            env_slice = slice(start, start + rows)
+            env.set_output_buffers(
+                {key: buffer[env_slice] for key, buffer in self._obs_buffers.items()},
+                self._reward_buffer[env_slice],
+                self._done_buffer[env_slice],
+            )
+            start += rows
+
     def step(self, actions: Optional[np.array] = None):
         """
         The step function for the environment, follows the API from OpenAI Gym.
@@ -72,19 +168,44 @@ class ParallelRLEnv(VecEnv):
             all_done (`bool`): TODO
             all_info: TODO
         """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def step_async(self, actions: Optional[np.array] = None):
+        """Send the actions of a step to all the environments, the results are returned by step_wait."""
         for i in range(self.n_parallel):
-            # TODO comment what is going on here
-            action = actions[i * self.n_show : (i + 1) * self.n_show] if actions is not None else None
-            self.envs[i].step_send_async(action)
+            self.envs[i].step_send_async(self._env_actions(actions, i))
+
+    def step_wait(self):
+        return self._combine_replies(self._gather_replies())
+
+    async def astep(self, actions: Optional[np.array] = None):
+        """
+        Step all the environments concurrently without blocking the asyncio event loop, same returns as step.
+        """
+        replies = await asyncio.gather(*(env.astep(self._env_actions(actions, i)) for i, env in enumerate(self.envs)))
+        return self._combine_replies(replies)
+
+    def _env_actions(self, actions: Optional[np.array], index: int) -> Optional[np.array]:
+        """The actions of the actors of the maps shown by the environment at the given index."""
+        if actions is None:
+            return None
+        return actions[index * self.n_rows_per_env : (index + 1) * self.n_rows_per_env]
+
+    def _combine_replies(self, replies: List[Tuple]):
+        if self.inplace_buffers:
+            # Each environment already wrote its results in its slice of the batch arrays
+            all_info = []
+            for _, _, _, info in replies:
+                all_info.extend(info)
+            return self._obs_buffers, self._reward_buffer, self._done_buffer, all_info
 
         all_obs = []
         all_reward = []
         all_done = []
         all_info = []
 
-        for i in range(self.n_parallel):
-            obs, reward, done, info = self.envs[i].step_recv_async()
-
+        for obs, reward, done, info in replies:
             all_obs.append(obs)
             all_reward.extend(reward)
             all_done.extend(done)
@@ -96,6 +217,25 @@ class ParallelRLEnv(VecEnv):
 
         return all_obs, all_reward, all_done, all_info
 
+    def _gather_replies(self) -> List[Tuple]:
+        """Receive the step replies of all the environments, decoding each one as soon as it is ready."""
+        replies = [None] * self.n_parallel
+        # The replies already received by the engines are not signalled by the selector anymore
+        for i, env in enumerate(self.envs):
+            if env.scene.engine.step_reply_ready():
+                replies[i] = env.step_recv_async()
+        pending = replies.count(None)
+        while pending:
+            events = self._selector.select(timeout=SOCKET_TIME_OUT)
+            if not events:
+                missing = [i for i, reply in enumerate(replies) if reply is None]
+                raise TimeoutError(f"No step reply received from environments {missing} after {SOCKET_TIME_OUT}s")
+            for key, _ in events:
+                if replies[key.data] is None:
+                    replies[key.data] = self.envs[key.data].step_recv_async()
+                    pending -= 1
+        return replies
+
     @staticmethod
     def _combine_obs(obs):
         out = defaultdict(list)
@@ -116,41 +256,59 @@ class ParallelRLEnv(VecEnv):
         for i in range(self.n_parallel):
             obs = self.envs[i].reset()
             all_obs.append(obs)
+        if self.inplace_buffers:
+            return self._obs_buffers
         all_obs = self._combine_obs(all_obs)
 
         return all_obs
 
+    async def areset(self):
+        """Reset all the environments concurrently without blocking the asyncio event loop."""
+        all_obs = await asyncio.gather(*(env.areset() for env in self.envs))
+        if self.inplace_buffers:
+            return self._obs_buffers
+        return self._combine_obs(all_obs)
+
     def close(self):
+        self._selector.close()
         for env in self.envs:
             env.scene.close()
 
     def env_is_wrapped(self, wrapper_class: Type[gym.Wrapper], indices: VecEnvIndices = None) -> List[bool]:
-        return [False] * self.n_show * self.n_parallel
+        return [False] * len(get_env_indices(indices, self.num_envs))
 
-    # required abstract methods
+    def _group_indices(self, indices: VecEnvIndices) -> Tuple[List[int], List[int]]:
+        """The selected indices and the sub-environments they belong to (each one listed once)."""
+        indices = get_env_indices(indices, self.num_envs)
+        return indices, sorted({index // self.n_rows_per_env for index in indices})
 
-    def step_async(self, actions: np.ndarray) -> None:
-        raise NotImplementedError()
-
-    def seed(self, seed: Optional[int] = None):  # -> List[Union[None, int]]:
-        # this should be done when the env is initialized
-        return
-        # raise NotImplementedError()
+    def _dispatch(self, indices: VecEnvIndices, call: Callable[[int], Any]) -> List[Any]:
+        """Call a function once for each targeted sub-environment, its result is returned for each index."""
+        indices, env_indices = self._group_indices(indices)
+        results = {env_index: call(env_index) for env_index in env_indices}
+        return [results[index // self.n_rows_per_env] for index in indices]
 
     def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
-        raise NotImplementedError()
+        return self._dispatch(indices, lambda env_index: getattr(self.envs[env_index], attr_name))
 
     def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
-        raise NotImplementedError()
+        self._dispatch(indices, lambda env_index: setattr(self.envs[env_index], attr_name, value))
 
     def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> List[Any]:
-        raise NotImplementedError()
+        return self._dispatch(
+            indices, lambda env_index: getattr(self.envs[env_index], method_name)(*method_args, **method_kwargs)
+        )
 
-    def get_images(self) -> Sequence[np.ndarray]:
-        raise NotImplementedError()
+    def get_images(self, sensor_tag: Optional[str] = None) -> np.ndarray:
+        """Return the last camera frames of all the environments, stacked in a (n, height, width, channels) array."""
+        return np.concatenate([env.get_images(sensor_tag) for env in self.envs], axis=0)
 
-    def step_send(self):
-        raise NotImplementedError()
+    # required abstract methods
 
-    def step_wait(self):
+    def seed(self, seed: Optional[int] = None):  # -> List[Union[None, int]]:
+        # this should be done when the env is initialized
+        return
+        # raise NotImplementedError()
+
+    def step_send(self):
         raise NotImplementedError()
@@ -11,7 +11,9 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type, Union
+import base64
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
 
 import gym
 import numpy as np
@@ -22,7 +24,11 @@ try:
 except ImportError:
 
     class VecEnv:
-        pass  # Dummy class if SB3 is not installed
+        # Dummy class if SB3 is not installed
+        def __init__(self, num_envs: int, observation_space: gym.spaces.Space, action_space: gym.spaces.Space):
+            self.num_envs = num_envs
+            self.observation_space = observation_space
+            self.action_space = action_space
 
     class VecEnvIndices:
         pass  # Dummy class if SB3 is not installed
@@ -34,9 +40,22 @@ except ImportError:
 import simulate as sm
 
 # Lint as: python3
+from simulate.engine.frames import COMPRESSED_FRAME_ENCODINGS, decode_frames, transform_frames
 from simulate.scene import Scene
 
 
+SENSOR_BUFFER_DTYPES = {"uint8": np.uint8, "float": np.float32}
+
+
+def get_env_indices(indices: VecEnvIndices, num_envs: int) -> List[int]:
+    """The list of environment indices selected by a VecEnv `indices` argument (None selects all of them)."""
+    if indices is None:
+        return list(range(num_envs))
+    if isinstance(indices, int):
+        return [indices]
+    return list(indices)
+
+
 class RLEnv(VecEnv):
     """
     RL environment wrapper for Simulate scene. Uses functionality from the VecEnv in stable baselines 3
@@ -95,7 +114,30 @@ class RLEnv(VecEnv):
         self.observation_space = self.scene.actors[0].observation_space
         self.action_tags = self.scene.actors[0].action_tags
 
-        super().__init__(n_show, self.observation_space, self.action_space)
+        # Each actor of the maps shown is one row of the batched observations, rewards, dones and actions
+        super().__init__(self.n_show * self.n_actors_per_map, self.observation_space, self.action_space)
+
+        # Sensor tags of the cameras, whose last observations are returned by get_images
+        self._camera_sensor_tags = [
+            camera.sensor_tag for camera in self.scene.cameras if camera.sensor_tag is not None
+        ]
+        self._last_obs = None
+        self._pending_step = None
+
+        # Cameras whose frames are converted to grayscale or downsampled, by sensor tag
+        self._transformed_cameras = {
+            camera.sensor_tag: camera
+            for camera in self.scene.cameras
+            if camera.sensor_tag is not None and (camera.grayscale or camera.downsample > 1)
+        }
+
+        # Return and length of the running episode of each map/actor, an episode ends with its done flag
+        self.episode_returns = np.zeros(self.n_show * self.n_actors_per_map, dtype=np.float64)
+        self.episode_lengths = np.zeros(self.n_show * self.n_actors_per_map, dtype=np.int64)
+        self._start_time = time.time()
+
+        # Optional arrays owned by a caller (e.g. ParallelRLEnv) in which observations, rewards and dones are written
+        self._output_buffers = None
 
         # Don't return simulation data, since minimal/faster data will be returned by agent sensors
         self.scene.config.time_step = time_step
@@ -124,10 +166,28 @@ class RLEnv(VecEnv):
             info: TODO
         """
 
+        latency = getattr(self.scene.engine, "latency", None)
+        if latency is None:
+            self.step_send_async(action=action)
+            return self.step_recv_async()
+        start = latency.now()
         self.step_send_async(action=action)
-        return self.step_recv_async()
+        result = self.step_recv_async()
+        latency.record_since("step", start)
+        return result
 
-    def step_send_async(self, action: Union[Dict, List, np.ndarray]):
+    def step_send_async(self, action: Union[Dict, List, np.ndarray]) -> int:
+        """
+        Send the actions of a step without waiting for the resulting observations.
+        Several steps can be in flight if the engine was created with `engine_max_in_flight` > 1.
+
+        Returns:
+            sequence (`int`): the sequence number of the step, to give to step_recv_async.
+        """
+        return self.scene.engine.step_send_async(action=self._format_actions(action))
+
+    def _format_actions(self, action: Union[Dict, List, np.ndarray]) -> Dict:
+        """Actions of a step as sent to the engine: one (n_show, n_actors_per_map, action_dim) block per tag."""
         if not isinstance(action, dict):
             if len(self.action_tags) != 1:
                 raise ValueError(
@@ -135,15 +195,27 @@ class RLEnv(VecEnv):
                 )
             action = {self.action_tags[0]: action}
 
+        # When the engine speaks the binary protocol, NumPy actions are sent as typed blocks instead of JSON lists
+        binary_actions = getattr(self.scene.engine, "binary_protocol", False)
+
         # Check that the keys are in the action tags
         # Add maps/actor dimension to action if single map/actor
+        actions = {}
         for key, value in action.items():
             if key not in self.action_tags:
                 raise ValueError(f"Action tag {key} not found in action tags: {self.action_tags}.")
-            if isinstance(value, (int, float)):
+            if isinstance(value, np.ndarray):
+                # Batched actions: one (n_show, n_actors_per_map, action_dim) block per tag
+                value = value.reshape((self.n_show, self.n_actors_per_map, -1))
+                if not binary_actions:
+                    value = value.tolist()
+                elif np.issubdtype(value.dtype, np.floating):
+                    # Continuous actions are sent as float32, integer (discrete) actions keep their dtype
+                    value = value.astype(np.float32, copy=False)
+            elif isinstance(value, (int, float)):
                 # A single value for the action – we add the map/actor/action-list dimensions
                 if self.n_show == 1 and self.n_actors == 1:
-                    action[key] = [[[value]]]
+                    value = [[[value]]]
                 else:
                     raise ValueError(
                         f"All actions must be list (maps) of list (actors) of list of floats/int (action). "
@@ -153,22 +225,37 @@ class RLEnv(VecEnv):
             elif isinstance(value, (list, tuple)) and len(value) > 0 and isinstance(value[0], (int, float)):
                 # A list value for the action – we add the map/actor dimensions
                 if self.n_show == 1 and self.n_actors == 1:
-                    action[key] = [[value]]
+                    value = [[value]]
                 else:
                     raise ValueError(
                         f"All actions must be list (maps) of list (actors) of list of floats/int (action). "
                         f"if the number of maps or actors is greater than 1 (in our case n_show: {self.n_show} "
                         f"and n_actors {self.n_actors})."
                     )
-            elif isinstance(value, np.ndarray) and len(value) > 0 and isinstance(value[0], (np.int64, np.float32)):
-                # actions are a number array
-                value = value.reshape((self.n_show, self.n_actors_per_map, -1))
-                action[key] = value.tolist()
+            actions[key] = value
+        return actions
 
-        self.scene.engine.step_send_async(action=action)
+    def step_recv_async(self, sequence: Optional[int] = None) -> Tuple[Dict, np.ndarray, np.ndarray, List[Dict]]:
+        """
+        Receive the result of a step sent with step_send_async.
 
-    def step_recv_async(self) -> Tuple[Dict, np.ndarray, np.ndarray, List[Dict]]:
-        event = self.scene.engine.step_recv_async()
+        Args:
+            sequence (`int`, optional): the sequence number returned by step_send_async, default to the oldest step.
+        """
+        return self._step_outputs(self.scene.engine.step_recv_async(sequence))
+
+    async def astep(self, action: Union[Dict, List, np.ndarray]) -> Tuple[Dict, np.ndarray, np.ndarray, List[Dict]]:
+        """
+        Step the environment without blocking the asyncio event loop, same arguments and returns as step.
+        Several environments can be stepped concurrently from one event loop, e.g. with asyncio.gather.
+        """
+        event = await self.scene.engine.astep(action=self._format_actions(action))
+        return self._step_outputs(event)
+
+    def _step_outputs(self, event: Dict) -> Tuple[Dict, np.ndarray, np.ndarray, List[Dict]]:
+        """Convert the reply of a step to observations, rewards and dones arrays."""
+        latency = getattr(self.scene.engine, "latency", None)
+        start = latency.now() if latency is not None else None
 
         # Extract observations, reward, and done from event data
         # TODO nathan thinks we should make this for 1 agent, have a separate one for multiple agents.
@@ -178,43 +265,159 @@ class RLEnv(VecEnv):
 
         obs = self._squeeze_actor_dimension(obs)
 
-        return obs, reward, done, [{}] * len(done)
+        if self._output_buffers is not None:
+            obs, reward, done = self._write_output_buffers(obs, reward, done)
+        info = self._episode_infos(event, reward, done)
+        self._last_obs = obs
+
+        if latency is not None:
+            latency.record_since("convert", start)
+        return obs, reward, done, info
+
+    def _episode_infos(self, event: Dict, reward: np.ndarray, done: np.ndarray) -> List[Dict]:
+        """
+        Update the returns and lengths of the running episodes and build the infos of a step.
+
+        Only the maps/actors whose episode ended get their own info, with the episode summary
+        {"r": return, "l": length, "t": time since the creation of the environment} under "episode" (as
+        SB3's Monitor) and, if the backend sends it, their last observation under "terminal_observation".
+        Backends reporting time-limit truncations in an actor_truncated_buffer also set "TimeLimit.truncated".
+        """
+        self.episode_returns += reward
+        self.episode_lengths += 1
+        infos = [{} for _ in range(len(done))]
+        done_indices = np.flatnonzero(done)
+        if not done_indices.size:
+            return infos
+
+        terminal_obs = None
+        if "actor_terminal_sensor_buffers" in event:
+            # The backend resets the finished maps before rendering, their last observation is sent separately
+            terminal_obs = self._squeeze_actor_dimension(
+                self._extract_sensor_obs(event["actor_terminal_sensor_buffers"])
+            )
+        truncated = None
+        if "actor_truncated_buffer" in event:
+            truncated = self._convert_to_numpy(event["actor_truncated_buffer"]).flatten()
+        elapsed = round(time.time() - self._start_time, 6)
+        returns = self.episode_returns[done_indices].tolist()
+        lengths = self.episode_lengths[done_indices].tolist()
+        for index, episode_return, episode_length in zip(done_indices.tolist(), returns, lengths):
+            infos[index] = {"episode": {"r": episode_return, "l": episode_length, "t": elapsed}}
+            if truncated is not None:
+                infos[index]["TimeLimit.truncated"] = bool(truncated[index])
+            if terminal_obs is not None:
+                infos[index]["terminal_observation"] = {
+                    key: value[index].copy() for key, value in terminal_obs.items()
+                }
+        self.episode_returns[done_indices] = 0.0
+        self.episode_lengths[done_indices] = 0
+        return infos
+
+    def set_output_buffers(self, obs: Dict[str, np.ndarray], reward: np.ndarray, done: np.ndarray):
+        """
+        Write the observations, rewards and dones of each step and reset in the provided arrays
+        instead of returning new arrays. The same arrays are then returned at each step.
+
+        Args:
+            obs (`Dict`): a dict with sensor tags as keys and as values arrays of shape (n_show * n_actors_per_map, ...)
+            reward (`np.ndarray`): an array of shape (n_show * n_actors_per_map,)
+            done (`np.ndarray`): an array of shape (n_show * n_actors_per_map,)
+        """
+        self._output_buffers = (obs, reward, done)
+
+    def _write_output_buffers(
+        self, obs: Dict, reward: Optional[np.ndarray] = None, done: Optional[np.ndarray] = None
+    ) -> Tuple[Dict, np.ndarray, np.ndarray]:
+        obs_buffers, reward_buffer, done_buffer = self._output_buffers
+        for key, value in obs.items():
+            np.copyto(obs_buffers[key], value)
+        if reward is not None:
+            np.copyto(reward_buffer, reward)
+        if done is not None:
+            np.copyto(done_buffer, done)
+        return obs_buffers, reward_buffer, done_buffer
 
     def _squeeze_actor_dimension(self, obs: Dict) -> Dict:
         for k, v in obs.items():
             obs[k] = obs[k].reshape((self.n_show * self.n_actors_per_map, *obs[k].shape[2:]))
         return obs
 
-    def reset(self) -> Dict:
+    def reset(self, seed: Optional[int] = None) -> Dict:
         """
         Resets the actors and the scene of the environment.
 
+        Args:
+            seed (`int`, optional): seed forwarded to the backend with the reset command.
+
         Returns:
             obs (`Dict`): the observation of the environment after reset.
         """
-        self.scene.reset()
+        self.scene.reset(seed=seed)
 
         # To extract observations, we do a "fake" step (no actual simulation with frame_skip=0)
         event = self.scene.step(return_frames=True, frame_skip=0)
+        return self._reset_outputs(event)
+
+    async def areset(self, seed: Optional[int] = None) -> Dict:
+        """
+        Resets the actors and the scene of the environment without blocking the asyncio event loop.
+
+        Args:
+            seed (`int`, optional): seed forwarded to the backend with the reset command.
+
+        Returns:
+            obs (`Dict`): the observation of the environment after reset.
+        """
+        await self.scene.areset(seed=seed)
+        event = await self.scene.astep(return_frames=True, frame_skip=0)
+        return self._reset_outputs(event)
+
+    def _reset_outputs(self, event: Dict) -> Dict:
+        self.episode_returns[:] = 0.0
+        self.episode_lengths[:] = 0
         obs = self._extract_sensor_obs(event["actor_sensor_buffers"])
         obs = self._squeeze_actor_dimension(obs)
+        if self._output_buffers is not None:
+            obs, _, _ = self._write_output_buffers(obs)
+        self._last_obs = obs
         return obs
 
     @staticmethod
-    def _convert_to_numpy(event_data: Dict) -> np.ndarray:
-        if event_data["type"] == "uint8":
-            shape = event_data["shape"]
-            return np.array(event_data["uintBuffer"], dtype=np.uint8).reshape(shape)
-        elif event_data["type"] == "float":
-            shape = event_data["shape"]
-            return np.array(event_data["floatBuffer"], dtype=np.float32).reshape(shape)
-        else:
+    def _convert_to_numpy(event_data: Union[Dict, np.ndarray]) -> np.ndarray:
+        if isinstance(event_data, np.ndarray):
+            # Tensor section of a binary frame, already a view on the receive buffer
+            return event_data
+        if event_data["type"] not in SENSOR_BUFFER_DTYPES:
             raise TypeError
+        dtype = SENSOR_BUFFER_DTYPES[event_data["type"]]
+        shape = event_data["shape"]
+        if event_data.get("encoding") in COMPRESSED_FRAME_ENCODINGS:
+            # PNG/JPEG camera frames, decompressed in one batched array
+            buffer = event_data["bytesBuffer"]
+            if isinstance(buffer, str):
+                buffer = base64.b64decode(buffer)
+            return decode_frames(buffer, event_data["frameSizes"], shape)
+        if "bytesBuffer" in event_data:
+            # Raw contiguous payload: wrapped as is, without building a Python int/float per value
+            buffer = event_data["bytesBuffer"]
+            if isinstance(buffer, str):
+                buffer = base64.b64decode(buffer)
+            return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+        elif event_data["type"] == "uint8":
+            return np.array(event_data["uintBuffer"], dtype=dtype).reshape(shape)
+        else:
+            return np.array(event_data["floatBuffer"], dtype=dtype).reshape(shape)
 
     def _extract_sensor_obs(self, sim_event_data: Dict) -> Dict:
         sensor_obs = {}
         for sensor_tag, sensor_data in sim_event_data.items():
-            sensor_obs[sensor_tag] = self._convert_to_numpy(sensor_data)
+            obs = self._convert_to_numpy(sensor_data)
+            camera = self._transformed_cameras.get(sensor_tag)
+            if camera is not None and list(obs.shape[-3:]) != camera.frame_shape:
+                # The backend ignored the grayscale/downsample settings of the camera, they are applied here
+                obs = transform_frames(obs, grayscale=camera.grayscale, downsample=camera.downsample)
+            sensor_obs[sensor_tag] = obs
         return sensor_obs
 
     def close(self):
@@ -234,32 +437,58 @@ class RLEnv(VecEnv):
         return np.array(action)
 
     def env_is_wrapped(self, wrapper_class: Type[gym.Wrapper], indices: Optional[VecEnvIndices] = None) -> List[bool]:
-        return [False] * self.n_agents * self.n_parallel
+        return [False] * len(get_env_indices(indices, self.num_envs))
 
     # required abstract methods
 
     def step_async(self, actions: np.ndarray) -> None:
-        raise NotImplementedError()
+        """Send the actions of a step, the results are returned by step_wait."""
+        if self._pending_step is not None:
+            raise RuntimeError("step_wait must be called before sending the actions of the next step")
+        self._pending_step = self.step_send_async(actions)
+
+    def step_wait(self) -> VecEnvStepReturn:
+        if self._pending_step is None:
+            raise RuntimeError("step_async must be called before step_wait")
+        sequence, self._pending_step = self._pending_step, None
+        return self.step_recv_async(sequence)
 
     def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
-        raise NotImplementedError()
+        """
+        Return an attribute of the environment for each of the given indices.
+        All the maps shown are part of this environment, the attribute is read once.
+        """
+        value = getattr(self, attr_name)
+        return [value] * len(get_env_indices(indices, self.num_envs))
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        """Set an attribute of the environment, shared by all the maps shown."""
+        setattr(self, attr_name, value)
 
     def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> List[Any]:
-        raise NotImplementedError()
+        """Call a method of the environment once, its result is returned for each of the given indices."""
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result] * len(get_env_indices(indices, self.num_envs))
+
+    def get_images(self, sensor_tag: Optional[str] = None) -> np.ndarray:
+        """
+        Return the last frames of a camera sensor (by default the first one) of the maps/actors.
+
+        Returns:
+            images (`np.ndarray`): the frames stacked in a uint8 array of shape (n, height, width, channels).
+        """
+        if self._last_obs is None:
+            raise RuntimeError("The environment must be reset or stepped before getting its images")
+        tags = [sensor_tag] if sensor_tag is not None else self._camera_sensor_tags
+        tags = [tag for tag in tags if tag in self._last_obs]
+        if not tags:
+            raise ValueError("No camera sensor found in the observations of the environment")
+        return np.ascontiguousarray(np.moveaxis(self._last_obs[tags[0]], -3, -1))
 
     def seed(self, seed: Optional[int] = None):  # -> List[Union[None, int]]:
         # this should be done when the env is initialized
         return
         # raise NotImplementedError()
 
-    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
-        raise NotImplementedError()
-
     def step_send(self) -> Any:
         raise NotImplementedError()
-
-    def step_wait(self) -> VecEnvStepReturn:
-        raise NotImplementedError()
-
-    def get_images(self) -> Sequence[np.ndarray]:
-        raise NotImplementedError()
@@ -0,0 +1,293 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+import asyncio
+import multiprocessing as mp
+import traceback
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .parallel_rl_env import ParallelRLEnv, VecEnvIndices
+
+
+WORKER_CLOSE_TIME_OUT = 10.0  # Timeout in seconds
+
+
+def _create_shared_array(shape: Tuple[int, ...], dtype: np.dtype) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    dtype = np.dtype(dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _attach_shared_array(description: Dict) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    shm = shared_memory.SharedMemory(name=description["name"])
+    return shm, np.ndarray(description["shape"], dtype=np.dtype(description["dtype"]), buffer=shm.buf)
+
+
+def _describe_shared_array(shm: shared_memory.SharedMemory, array: np.ndarray) -> Dict:
+    return {"name": shm.name, "shape": array.shape, "dtype": array.dtype.str}
+
+
+def _worker(remote: Connection, parent_remote: Connection, env_fn: Callable, port: int):
+    """Build a sub-environment and answer the commands of SubprocParallelRLEnv until it is closed."""
+    parent_remote.close()
+    env = None
+    segments = []
+    action_buffer = None
+    try:
+        env = env_fn(port)
+        remote.send((env.n_show, env.n_actors_per_map, env.num_envs, env.observation_space, env.action_space))
+        while True:
+            command, data = remote.recv()
+            try:
+                if command == "buffers":
+                    # Views on this environment's rows of the batch arrays shared with the main process
+                    rows = slice(*data["rows"])
+                    arrays = {}
+                    for key, description in data["arrays"].items():
+                        shm, array = _attach_shared_array(description)
+                        segments.append(shm)
+                        arrays[key] = array[rows]
+                    obs = {key[len("obs/") :]: array for key, array in arrays.items() if key.startswith("obs/")}
+                    env.set_output_buffers(obs, arrays["reward"], arrays["done"])
+                    action_buffer = arrays["action"]
+                    remote.send(None)
+                elif command == "step":
+                    # Batched NumPy actions are read from the shared action buffer
+                    action = action_buffer if data is None else data
+                    _, _, _, info = env.step(action)
+                    remote.send(info)
+                elif command == "reset":
+                    env.reset()
+                    remote.send(None)
+                elif command == "get_attr":
+                    remote.send(getattr(env, data))
+                elif command == "set_attr":
+                    remote.send(setattr(env, *data))
+                elif command == "env_method":
+                    method_name, method_args, method_kwargs = data
+                    remote.send(getattr(env, method_name)(*method_args, **method_kwargs))
+                elif command == "get_images":
+                    remote.send(env.get_images(data))
+                elif command == "close":
+                    break
+                else:
+                    raise ValueError(f"Unknown command {command}")
+            except Exception:
+                remote.send(RuntimeError(f"Error in the environment on port {port}:\n{traceback.format_exc()}"))
+    except Exception:
+        remote.send(RuntimeError(f"Error creating the environment on port {port}:\n{traceback.format_exc()}"))
+    finally:
+        if env is not None:
+            env.close()
+        # Release the views on the shared memory before closing it
+        env = action_buffer = None
+        for shm in segments:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # Views still referenced by the environment, released with the process
+        remote.close()
+
+
+class SubprocParallelRLEnv(ParallelRLEnv):
+    """
+    Variant of ParallelRLEnv running each sub-environment in its own worker process.
+
+    The scene of each sub-environment is built, shown and stepped in its worker, so scene construction, GLB export
+    and the decoding of the replies of the executables run on several cores. Batched NumPy actions, observations,
+    rewards and dones are exchanged through shared memory arrays, only the commands and infos go through pipes.
+
+    Args:
+        env_fn (`Callable`): a picklable function returning a RLEnv for a given communication port.
+        n_parallel (`int`): the number of executable instances (and worker processes) to create.
+        starting_port (`int`): initial communication port for spawned executables.
+        inplace_buffers (`bool`): if True, the shared batch arrays are returned at each step instead of copies
+            (copy them if you need to keep them).
+        start_method (`str`, optional): the multiprocessing start method, default to forkserver if available and
+            spawn otherwise.
+    """
+
+    def __init__(
+        self,
+        env_fn: Callable,
+        n_parallel: int,
+        starting_port: int = 55001,
+        inplace_buffers: bool = False,
+        start_method: Optional[str] = None,
+    ):
+        self.n_parallel = n_parallel
+        self.inplace_buffers = inplace_buffers
+        self._segments = []
+        self._closed = False
+
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        context = mp.get_context(start_method)
+        self.remotes, work_remotes = zip(*[context.Pipe() for _ in range(n_parallel)])
+        self.processes = []
+        for i, (work_remote, remote) in enumerate(zip(work_remotes, self.remotes)):
+            process = context.Process(
+                target=_worker, args=(work_remote, remote, env_fn, starting_port + i), daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        # The sub-environments are built concurrently, each in its worker
+        try:
+            specs = self._recv_all()
+        except Exception:
+            self.close()
+            raise
+        self.n_show, self.n_actors_per_map, self.n_rows_per_env, observation_space, action_space = specs[0]
+        super(ParallelRLEnv, self).__init__(self.n_rows_per_env * n_parallel, observation_space, action_space)
+
+        # One row of the shared arrays per actor of the maps shown, as the rows of the batch of each RLEnv
+        self._create_shared_buffers([n_rows for _, _, n_rows, _, _ in specs])
+
+    def _create_shared_buffers(self, n_rows: List[int]):
+        n_total = sum(n_rows)
+        action_dim = int(np.prod(self.action_space.shape))
+        arrays = {f"obs/{key}": (space.shape, space.dtype) for key, space in self.observation_space.spaces.items()}
+        arrays.update(
+            {
+                "reward": ((), np.float32),
+                "done": ((), np.float32),
+                "action": ((action_dim,), self.action_space.dtype or np.float32),
+            }
+        )
+
+        descriptions = {}
+        buffers = {}
+        for key, (shape, dtype) in arrays.items():
+            shm, array = _create_shared_array((n_total, *shape), dtype)
+            self._segments.append(shm)
+            buffers[key] = array
+            descriptions[key] = _describe_shared_array(shm, array)
+        self._obs_buffers = {key[len("obs/") :]: array for key, array in buffers.items() if key.startswith("obs/")}
+        self._reward_buffer = buffers["reward"]
+        self._done_buffer = buffers["done"]
+        self._action_buffer = buffers["action"]
+
+        start = 0
+        for remote, rows in zip(self.remotes, n_rows):
+            remote.send(("buffers", {"rows": (start, start + rows), "arrays": descriptions}))
+            start += rows
+        self._recv_all()
+
+    def _recv_all(self, remotes: Optional[List[Connection]] = None) -> List[Any]:
+        results = [remote.recv() for remote in (remotes if remotes is not None else self.remotes)]
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def _outputs(self) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        if self.inplace_buffers:
+            return self._obs_buffers, self._reward_buffer, self._done_buffer
+        obs = {key: array.copy() for key, array in self._obs_buffers.items()}
+        return obs, self._reward_buffer.copy(), self._done_buffer.copy()
+
+    def step(self, actions: Optional[Union[np.ndarray, Dict, List]] = None):
+        """
+        Step all the sub-environments in their workers, follows the API from OpenAI Gym.
+
+        Args:
+            actions (`np.ndarray`, `Dict` or `List`): the actions of all the sub-environments. NumPy arrays
+                are written in the shared action buffer, other actions are sent to the workers through pipes.
+        """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def step_async(self, actions: Optional[Union[np.ndarray, Dict, List]] = None):
+        """Send the actions of a step to all the workers, the results are returned by step_wait."""
+        if isinstance(actions, np.ndarray):
+            np.copyto(self._action_buffer, actions.reshape(self._action_buffer.shape), casting="unsafe")
+            commands = [("step", None)] * self.n_parallel
+        else:
+            commands = [("step", self._env_actions(actions, i)) for i in range(self.n_parallel)]
+        for remote, command in zip(self.remotes, commands):
+            remote.send(command)
+
+    def step_wait(self):
+        all_info = []
+        for info in self._recv_all():
+            all_info.extend(info)
+        obs, reward, done = self._outputs()
+        return obs, reward, done, all_info
+
+    def reset(self):
+        for remote in self.remotes:
+            remote.send(("reset", None))
+        self._recv_all()
+        obs, _, _ = self._outputs()
+        return obs
+
+    def _dispatch_command(self, command: str, data: Any, indices: VecEnvIndices) -> List[Any]:
+        """Send a command once to each targeted worker, then wait for all their results."""
+        indices, env_indices = self._group_indices(indices)
+        remotes = [self.remotes[env_index] for env_index in env_indices]
+        for remote in remotes:
+            remote.send((command, data))
+        results = dict(zip(env_indices, self._recv_all(remotes)))
+        return [results[index // self.n_rows_per_env] for index in indices]
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        return self._dispatch_command("get_attr", attr_name, indices)
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        self._dispatch_command("set_attr", (attr_name, value), indices)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> List[Any]:
+        return self._dispatch_command("env_method", (method_name, method_args, method_kwargs), indices)
+
+    def get_images(self, sensor_tag: Optional[str] = None) -> np.ndarray:
+        for remote in self.remotes:
+            remote.send(("get_images", sensor_tag))
+        return np.concatenate(self._recv_all(), axis=0)
+
+    async def astep(self, actions: Optional[Union[np.ndarray, Dict, List]] = None):
+        """Step the sub-environments without blocking the asyncio event loop (the pipes are waited on in a thread)."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.step, actions)
+
+    async def areset(self):
+        return await asyncio.get_running_loop().run_in_executor(None, self.reset)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for remote in self.remotes:
+            try:
+                remote.send(("close", None))
+            except (BrokenPipeError, EOFError):
+                pass  # The worker already exited
+        for process in self.processes:
+            process.join(WORKER_CLOSE_TIME_OUT)
+            if process.is_alive():
+                process.terminate()
+        for remote in self.remotes:
+            remote.close()
+
+        # Release our views before unlinking the shared memory
+        self._obs_buffers = self._reward_buffer = self._done_buffer = self._action_buffer = None
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        self._segments = []
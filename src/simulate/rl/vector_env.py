@@ -0,0 +1,189 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+""" Gymnasium-style vector environment over the maps and actors of a Simulate scene."""
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ..scene import Scene
+from .rl_env import RLEnv
+
+
+try:
+    import gymnasium
+    from gymnasium.vector import VectorEnv
+    from gymnasium.vector.utils import batch_space
+except ImportError:
+    gymnasium = None
+    from gym.vector.utils import batch_space
+
+    class VectorEnv:
+        pass  # Dummy class if gymnasium is not installed
+
+
+try:
+    from gymnasium.vector import AutoresetMode
+
+    AUTORESET_MODE = AutoresetMode.SAME_STEP
+except ImportError:
+    AUTORESET_MODE = "SameStep"
+
+
+def to_gymnasium_space(space: Any) -> Any:
+    """Convert a gym (or simulate) space to the equivalent gymnasium space, returned as is without gymnasium."""
+    if gymnasium is None or isinstance(space, gymnasium.spaces.Space):
+        return space
+    space_type = type(space).__name__
+    if space_type == "Dict":
+        return gymnasium.spaces.Dict({key: to_gymnasium_space(value) for key, value in space.spaces.items()})
+    if space_type == "Tuple":
+        return gymnasium.spaces.Tuple([to_gymnasium_space(value) for value in space.spaces])
+    if space_type == "Box":
+        return gymnasium.spaces.Box(low=space.low, high=space.high, shape=space.shape, dtype=space.dtype)
+    if space_type == "Discrete":
+        return gymnasium.spaces.Discrete(int(space.n), start=int(getattr(space, "start", 0)))
+    if space_type == "MultiDiscrete":
+        return gymnasium.spaces.MultiDiscrete(space.nvec, dtype=space.dtype)
+    if space_type == "MultiBinary":
+        return gymnasium.spaces.MultiBinary(space.n)
+    raise TypeError(f"Can't convert the space {space} to a gymnasium space")
+
+
+class VectorRLEnv(VectorEnv):
+    """
+    Vector environment following the gymnasium VectorEnv API, each map/actor of the scene being one sub-environment.
+
+    The maps are simulated in a single backend and stepped as one batch: observations, rewards, terminations and
+    truncations are returned as arrays of shape (num_envs, ...). When gymnasium is installed the spaces are
+    gymnasium spaces (converted from the gym spaces of the actors). The backend resets the maps at the end of their
+    episodes before rendering (same-step autoreset): the observation returned for a finished map is the first one
+    of its next episode, its last observation and episode statistics are in the infos:
+        - "final_obs": the last observations, as arrays of shape (num_envs, ...) for each sensor tag
+        - "final_info": a dict with the "episode" statistics {"r": returns, "l": lengths, "t": times}
+        - "_final_obs", "_final_info": boolean masks of the sub-environments whose episode ended
+
+    Args:
+        scene_or_map_fn: a Simulate Scene or a generator function for generating instances of the desired environment.
+        n_maps: the number of map instances to create, default 1.
+        n_show: the number of maps shown and stepped at the same time.
+        time_step: the physics timestep of the environment.
+        frame_skip: the number of times an action is repeated in the backend simulation before the next observation is returned.
+    """
+
+    metadata = {"autoreset_mode": AUTORESET_MODE}
+
+    def __init__(
+        self,
+        scene_or_map_fn: Union[Callable, Scene],
+        n_maps: Optional[int] = 1,
+        n_show: Optional[int] = 1,
+        time_step: Optional[float] = 1 / 30.0,
+        frame_skip: Optional[int] = 4,
+        **engine_kwargs,
+    ):
+        self.env = RLEnv(
+            scene_or_map_fn, n_maps=n_maps, n_show=n_show, time_step=time_step, frame_skip=frame_skip, **engine_kwargs
+        )
+        self.num_envs = self.env.n_show * self.env.n_actors_per_map
+        self.single_observation_space = to_gymnasium_space(self.env.observation_space)
+        self.single_action_space = to_gymnasium_space(self.env.action_space)
+        self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+        self.action_space = batch_space(self.single_action_space, self.num_envs)
+        self.closed = False
+
+    def reset(
+        self, *, seed: Optional[Union[int, List[int]]] = None, options: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """
+        Reset all the sub-environments.
+
+        Args:
+            seed (`int`, optional): seed of the action spaces and of the backend. All the maps are simulated by
+                one backend with a single random generator, they can't be seeded one by one with a list of seeds.
+            options (`Dict`, optional): unused, for compatibility with the gymnasium API.
+
+        Returns:
+            obs (`Dict`): arrays of shape (num_envs, ...) for each sensor tag.
+            infos (`Dict`): empty.
+        """
+        if isinstance(seed, (list, tuple)):
+            raise ValueError(
+                "The maps of a VectorRLEnv share one backend which can't seed them one by one, use an int seed"
+            )
+        if seed is not None:
+            self.single_action_space.seed(seed)
+            self.action_space.seed(seed)
+        return self.env.reset(seed=seed), {}
+
+    def step(
+        self, actions: Union[np.ndarray, Dict]
+    ) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray, np.ndarray, Dict[str, Any]]:
+        """
+        Step all the sub-environments with a batch of actions.
+
+        Args:
+            actions (`np.ndarray` or `Dict`): actions of shape (num_envs, ...), by action tag for several tags.
+
+        Returns:
+            obs (`Dict`): arrays of shape (num_envs, ...) for each sensor tag.
+            rewards (`np.ndarray`): float32 array of shape (num_envs,).
+            terminated (`np.ndarray`): boolean array of shape (num_envs,), the episodes which ended.
+            truncated (`np.ndarray`): boolean array of shape (num_envs,), the episodes cut by the backend
+                (reported as "TimeLimit.truncated" in the infos of the RLEnv, none otherwise).
+            infos (`Dict`): the statistics and last observations of the episodes which ended, see the class docstring.
+        """
+        self.env.step_async(actions)
+        obs, rewards, dones, env_infos = self.env.step_wait()
+
+        ended = dones > 0
+        truncated = np.array([info.get("TimeLimit.truncated", False) for info in env_infos], dtype=bool)
+        terminated = ended & ~truncated
+        return obs, rewards, terminated, truncated, self._batch_infos(env_infos, ended)
+
+    def _batch_infos(self, env_infos: List[Dict], ended: np.ndarray) -> Dict[str, Any]:
+        """Convert the infos of the finished episodes to a dict of arrays with masks, as gymnasium vector envs."""
+        if not ended.any():
+            return {}
+        indices = np.flatnonzero(ended)
+        episode = {
+            "r": np.zeros(self.num_envs, dtype=np.float64),
+            "l": np.zeros(self.num_envs, dtype=np.int64),
+            "t": np.zeros(self.num_envs, dtype=np.float64),
+        }
+        for index in indices:
+            for key, value in env_infos[index]["episode"].items():
+                episode[key][index] = value
+        infos = {"final_info": {"episode": episode, "_episode": ended}, "_final_info": ended}
+
+        if "terminal_observation" in env_infos[indices[0]]:
+            final_obs = {}
+            for key, space in self.single_observation_space.spaces.items():
+                final_obs[key] = np.zeros((self.num_envs, *space.shape), dtype=space.dtype)
+                for index in indices:
+                    final_obs[key][index] = env_infos[index]["terminal_observation"][key]
+            infos["final_obs"] = final_obs
+            infos["_final_obs"] = ended
+        return infos
+
+    def render(self) -> np.ndarray:
+        """The last camera frames of the sub-environments, in an array of shape (num_envs, height, width, channels)."""
+        return self.env.get_images()
+
+    def close(self, **kwargs):
+        if self.closed:
+            return
+        self.env.close()
+        self.closed = True
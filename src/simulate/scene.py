@@ -229,6 +229,36 @@ class Scene(Asset):
         engine_kwargs: Dict
             Additional kwargs to pass to the engine.
         """
+        engine_kwargs = self._step_kwargs(time_step, frame_skip, return_nodes, return_frames, engine_kwargs)
+        return self.engine.step(action=action, **engine_kwargs)
+
+    async def astep(
+        self,
+        action: Optional[Dict[str, Union[int, float, List[float]]]] = None,
+        time_step: Optional[float] = None,
+        frame_skip: Optional[int] = None,
+        return_nodes: Optional[bool] = None,
+        return_frames: Optional[bool] = None,
+        **engine_kwargs: Any,
+    ) -> Any:
+        """Step the Scene without blocking the asyncio event loop.
+
+        Same parameters as `step`. Only supported by engines with an asynchronous API (e.g. the Unity engine),
+        the scenes of several engines can then be stepped concurrently with asyncio.gather.
+        """
+        if not hasattr(self.engine, "astep"):
+            raise NotImplementedError(f"{self.engine} does not support asynchronous steps")
+        engine_kwargs = self._step_kwargs(time_step, frame_skip, return_nodes, return_frames, engine_kwargs)
+        return await self.engine.astep(action=action, **engine_kwargs)
+
+    def _step_kwargs(
+        self,
+        time_step: Optional[float],
+        frame_skip: Optional[int],
+        return_nodes: Optional[bool],
+        return_frames: Optional[bool],
+        engine_kwargs: Dict[str, Any],
+    ) -> Dict[str, Any]:
         if not self._is_shown:
             raise ValueError("The scene should be shown before stepping it (call scene.show()).")
         if time_step is not None:
@@ -239,12 +269,22 @@ class Scene(Asset):
             engine_kwargs.update({"return_nodes": return_nodes})
         if return_frames is not None:
             engine_kwargs.update({"return_frames": return_frames})
-        return self.engine.step(action=action, **engine_kwargs)
+        return engine_kwargs
 
-    def reset(self) -> Any:
-        """Reset the Scene"""
+    def reset(self, seed: Optional[int] = None) -> Any:
+        """Reset the Scene, with an optional seed for the engines supporting it"""
+        if seed is not None:
+            return self.engine.reset(seed=seed)
         return self.engine.reset()
 
+    async def areset(self, seed: Optional[int] = None) -> Any:
+        """Reset the Scene without blocking the asyncio event loop"""
+        if not hasattr(self.engine, "areset"):
+            raise NotImplementedError(f"{self.engine} does not support asynchronous resets")
+        if seed is not None:
+            return await self.engine.areset(seed=seed)
+        return await self.engine.areset()
+
     def close(self):
         self.engine.close()
 
@@ -16,6 +16,7 @@
 import unittest
 
 import simulate as sm
+from simulate.assets.gltf_export import tree_as_gltf
 
 
 # TODO add more tests on saving/exporting/loading gltf cameras in gltf files
@@ -27,3 +28,25 @@ class CameraTest(unittest.TestCase):
     def test_create_distant_camera(self):
         camera = sm.CameraDistant()
         self.assertIsInstance(camera, sm.CameraDistant)
+
+    def test_frame_settings(self):
+        camera = sm.Camera(width=64, height=32, frame_encoding="jpeg", jpeg_quality=80, grayscale=True, downsample=4)
+        self.assertEqual(list(camera.observation_space.shape), [1, 8, 16])
+        self.assertEqual(
+            camera.frame_settings, {"frame_encoding": "jpeg", "jpeg_quality": 80, "grayscale": True, "downsample": 4}
+        )
+        self.assertEqual(sm.Camera().frame_settings, {})
+        self.assertEqual(camera.copy().frame_settings, camera.frame_settings)
+
+        with self.assertRaises(ValueError):
+            sm.Camera(frame_encoding="webp")
+        with self.assertRaises(ValueError):
+            sm.Camera(downsample=0)
+
+    def test_frame_settings_gltf(self):
+        scene = sm.Scene()
+        scene += sm.Camera(name="camera", width=64, height=32, frame_encoding="png", downsample=2)
+        gltf_model = tree_as_gltf(scene).model
+        self.assertEqual(
+            gltf_model.cameras[0].extras, {"sensor_tag": "CameraSensor", "frame_encoding": "png", "downsample": 2}
+        )
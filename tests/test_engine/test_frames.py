@@ -0,0 +1,66 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from simulate.engine.frames import decode_frames, encode_frames, transform_frames
+
+
+class FramesTest(unittest.TestCase):
+    def test_png_roundtrip(self):
+        frames = np.random.default_rng(0).integers(0, 256, size=(2, 1, 3, 12, 16), dtype=np.uint8)
+        data, frame_sizes = encode_frames(frames, "png")
+        self.assertEqual(len(frame_sizes), 2)
+        self.assertEqual(sum(frame_sizes), len(data))
+        np.testing.assert_array_equal(decode_frames(data, frame_sizes, frames.shape), frames)
+
+        # Single channel frames and buffers received as NumPy arrays
+        gray = frames[:, :, :1]
+        data, frame_sizes = encode_frames(gray, "png")
+        decoded = decode_frames(np.frombuffer(data, dtype=np.uint8), frame_sizes, gray.shape)
+        np.testing.assert_array_equal(decoded, gray)
+
+        with self.assertRaises(ValueError):
+            decode_frames(data, frame_sizes[:1], gray.shape)
+
+    def test_jpeg_is_lossy_but_close(self):
+        frames = np.full((1, 1, 3, 16, 16), 128, dtype=np.uint8)
+        frames[..., 8:] = 32
+        data, frame_sizes = encode_frames(frames, "jpeg", quality=95)
+        decoded = decode_frames(data, frame_sizes, frames.shape)
+        self.assertLess(np.abs(decoded.astype(int) - frames.astype(int)).mean(), 4)
+
+    def test_transform_frames(self):
+        frames = np.zeros((2, 3, 4, 6), dtype=np.uint8)
+        frames[:, 0] = 255  # Red
+        gray = transform_frames(frames, grayscale=True)
+        self.assertEqual(gray.shape, (2, 1, 4, 6))
+        self.assertTrue(np.all(gray == 76))
+
+        frames = np.arange(16, dtype=np.uint8).reshape((1, 1, 4, 4))
+        downsampled = transform_frames(frames, downsample=2)
+        np.testing.assert_array_equal(downsampled, [[[[2, 4], [10, 12]]]])
+        self.assertEqual(transform_frames(np.zeros((3, 5, 5), dtype=np.uint8), downsample=2).shape, (3, 2, 2))
+
+    def test_missing_pillow(self):
+        frames = np.zeros((1, 3, 4, 4), dtype=np.uint8)
+        # Raw frames don't need Pillow, the compressed encodings raise a clear error without it
+        with mock.patch.dict("sys.modules", {"PIL": None, "PIL.Image": None}):
+            self.assertEqual(transform_frames(frames, grayscale=True).shape, (1, 1, 4, 4))
+            with self.assertRaisesRegex(ImportError, "Pillow"):
+                encode_frames(frames, "png")
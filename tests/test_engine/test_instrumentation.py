@@ -0,0 +1,59 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+import unittest
+
+from simulate.engine.instrumentation import LatencyHistogram, LatencyRecorder
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_record(self):
+        histogram = LatencyHistogram(buckets=[0.001, 0.01, 0.1])
+        for seconds in [0.0005, 0.002, 0.003, 0.05, 0.5]:
+            histogram.record(seconds)
+
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.mean, 0.1111)
+        self.assertEqual(histogram.min, 0.0005)
+        self.assertEqual(histogram.max, 0.5)
+        self.assertEqual(histogram.percentile(20), 0.001)
+        self.assertEqual(histogram.percentile(50), 0.01)
+        self.assertEqual(histogram.percentile(100), 0.5)
+
+    def test_empty(self):
+        summary = LatencyHistogram().as_dict()
+        self.assertEqual(summary["count"], 0)
+        self.assertEqual(summary["min"], 0.0)
+        self.assertEqual(summary["p99"], 0.0)
+
+
+class LatencyRecorderTest(unittest.TestCase):
+    def test_phases_and_callback(self):
+        measures = []
+        recorder = LatencyRecorder(callback=lambda phase, seconds: measures.append((phase, seconds)))
+        recorder.record("send", 0.001)
+        recorder.record("send", 0.003)
+        start = recorder.now()
+        recorder.record_since("decode", start)
+
+        stats = recorder.as_dict()
+        self.assertEqual(set(stats), {"send", "decode"})
+        self.assertEqual(stats["send"]["count"], 2)
+        self.assertAlmostEqual(stats["send"]["total"], 0.004)
+        self.assertEqual([phase for phase, _ in measures], ["send", "send", "decode"])
+
+        recorder.reset()
+        self.assertEqual(recorder.as_dict(), {})
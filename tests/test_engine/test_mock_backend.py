@@ -0,0 +1,383 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+import asyncio
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import simulate as sm
+from simulate.engine.mock_backend import mock_backend_command
+
+from ..test_rl.test_wrappers.create_env import create_map as create_camera_map
+from ..test_rl.test_wrappers.create_env import steps_overlap
+
+
+def create_map(index: int) -> sm.Asset:
+    return create_camera_map(index, camera_width=32, camera_height=24)
+
+
+class MockBackendTest(unittest.TestCase):
+    def test_scene_step(self):
+        scene = sm.Scene(engine="unity", engine_exe=mock_backend_command(), engine_port=0)
+        scene += sm.Box(name="box")
+        scene.show()
+        event = scene.step()
+        self.assertEqual(event, {"nodes": {}, "frames": {}})
+        scene.close()
+
+    def test_scene_astep(self):
+        scenes = [
+            sm.Scene(engine="unity", engine_exe=mock_backend_command("--step_latency", "0.2"), engine_port=0)
+            for _ in range(2)
+        ]
+        for scene in scenes:
+            scene += create_map(0)
+            with self.assertRaises(ValueError):
+                asyncio.run(scene.astep())
+            scene.show()
+
+        async def step_all():
+            return await asyncio.gather(*(scene.astep(frame_skip=1) for scene in scenes))
+
+        events = asyncio.run(step_all())
+        for event in events:
+            self.assertIn("nodes", event)
+        # The backends processed the steps at the same time: each received its step before the other replied
+        self.assertTrue(steps_overlap([scene.engine for scene in scenes]))
+        self.assertEqual(asyncio.run(scenes[0].areset()), {})
+        # The synchronous API can still be used after the asynchronous one
+        self.assertIn("nodes", scenes[0].step())
+        for scene in scenes:
+            scene.close()
+
+    def test_scene_astep_updates(self):
+        scene = sm.Scene(engine="unity", engine_exe=mock_backend_command(), engine_port=0)
+        scene += sm.Box(name="box")
+        scene.show()
+
+        # The pending changes are sent without blocking the event loop on a synchronous command
+        with mock.patch.object(scene.engine, "run_command", side_effect=AssertionError("Blocking command")):
+            scene.box.position = [1, 2, 3]
+            self.assertIn("nodes", asyncio.run(scene.astep()))
+            self.assertFalse(scene.engine.has_pending_updates)
+            scene += sm.Sphere(name="ball")
+            self.assertEqual(asyncio.run(scene.areset()), {})
+            self.assertFalse(scene.engine.has_pending_updates)
+        scene.close()
+
+    def test_node_arrays(self):
+        for protocol_args, node_arrays in [((), True), (("--no_node_arrays",), False), (("--json",), False)]:
+            scene = sm.Scene(
+                engine="unity",
+                engine_exe=mock_backend_command(*protocol_args),
+                engine_port=0,
+                engine_node_arrays=True,
+            )
+            scene += create_map(0)
+            scene.config.node_filter = ["floor_0", "actor_0"]
+            scene.show()
+            engine = scene.engine
+            self.assertEqual(engine.node_names, ["floor_0", "actor_0"])
+            self.assertEqual(engine.node_index["actor_0"], 1)
+
+            event = scene.step()
+            self.assertEqual("node_arrays" in event, node_arrays)
+            arrays = engine.get_node_arrays(event)
+            self.assertEqual(arrays["position"].shape, (2, 3))
+            self.assertEqual(arrays["rotation"].shape, (2, 4))
+            self.assertEqual(arrays["angular_velocity"].dtype, np.float32)
+            np.testing.assert_array_equal(arrays["position"], [[0, 1, 0], [1, 1, 0]])
+            np.testing.assert_array_equal(arrays["rotation"][:, 3], [1, 1])
+            scene.close()
+
+    def test_show_scene_bytes(self):
+        for protocol_args, is_binary in [((), True), (("--json",), False)]:
+            scene = sm.Scene(engine="unity", engine_exe=mock_backend_command(*protocol_args), engine_port=0)
+            scene += sm.Box(name="box")
+            response = scene.show()
+            self.assertEqual(scene.engine.binary_protocol, is_binary)
+            # The GLB is a raw section of the binary frame, or a base64 string with the JSON protocol
+            self.assertEqual(response["scene_nbytes"], len(scene.as_glb_bytes()))
+            payload = scene.engine._glb_payload(b"glTF")
+            self.assertEqual(list(payload), ["bytes"] if is_binary else ["b64bytes"])
+            scene.close()
+
+    def test_scene_without_incremental_updates(self):
+        engine_exe = mock_backend_command("--no_incremental_updates")
+        scene = sm.Scene(engine="unity", engine_exe=engine_exe, engine_port=0)
+        scene += sm.Box(name="box")
+        scene.show()
+        self.assertEqual(scene.step(), {"nodes": {}, "frames": {}})
+
+        # The changes can't be sent, they are rejected where they are made and the scene can still be stepped
+        with self.assertRaises(NotImplementedError):
+            scene.box.position = [1, 2, 3]
+        with self.assertRaises(NotImplementedError):
+            scene += sm.Box(name="wall")
+        with self.assertRaises(NotImplementedError):
+            scene.box.tree_parent = None
+        self.assertFalse(scene.engine.has_pending_updates)
+        self.assertEqual(scene.step(), {"nodes": {}, "frames": {}})
+        scene.close()
+
+    def test_scene_incremental_updates(self):
+        scene = sm.Scene(engine="unity", engine_exe=mock_backend_command(), engine_port=0)
+        scene += sm.Box(name="box")
+        scene += sm.Box(name="wall")
+        scene.box.position = [0, 1, 0]  # Sent with the scene at show()
+        scene.show()
+        self.assertFalse(scene.engine.has_pending_updates)
+
+        scene.box.position = [1, 2, 3]
+        scene += sm.Sphere(name="ball")
+        scene.ball += sm.Sphere(name="small_ball")
+        scene.ball.small_ball.position = [0, 1, 0]
+        scene.wall.tree_parent = None
+        updates = scene.engine._scene_updates()
+        self.assertEqual(
+            updates["nodes"], {"box": {"position": [1, 2, 3], "rotation": [0, 0, 0, 1], "scaling": [1, 1, 1]}}
+        )
+        self.assertEqual(list(updates["added"]), ["ball"])
+        self.assertEqual(updates["added"]["ball"]["parent"], scene.name)
+        self.assertIsInstance(updates["added"]["ball"]["bytes"], np.ndarray)
+        self.assertEqual(updates["removed"], ["wall"])
+
+        response = scene.engine.update_all_assets()
+        self.assertEqual(response, {"updated": 1, "added": 1, "removed": 1})
+        self.assertFalse(scene.engine.has_pending_updates)
+        self.assertIsNone(scene.engine.update_all_assets())
+
+        # Pending changes are sent before the next step
+        scene.ball.small_ball.position = [0, 2, 0]
+        self.assertTrue(scene.engine.has_pending_updates)
+        scene.step()
+        self.assertFalse(scene.engine.has_pending_updates)
+        scene.close()
+
+    def test_rl_env_step(self):
+        for protocol_args, engine_protocol, codec in [
+            ((), "binary", "binary"),
+            ((), "msgpack", "msgpack"),
+            (("--no_msgpack",), "msgpack", "binary"),
+            (("--json",), "binary", "json"),
+            ((), "json", "json"),
+        ]:
+            engine_exe = mock_backend_command(
+                "--sensor", "CameraSensor:uint8:3,24,32", "--episode_length", "2", *protocol_args
+            )
+            env = sm.RLEnv(
+                create_map,
+                n_maps=3,
+                n_show=2,
+                engine_exe=engine_exe,
+                engine_port=0,
+                engine_protocol=engine_protocol,
+            )
+            self.assertEqual(env.scene.engine.codec, codec)
+            self.assertEqual(env.scene.engine.binary_protocol, codec != "json")
+
+            obs = env.reset()
+            self.assertEqual(obs["CameraSensor"].shape, (2, 3, 24, 32))
+            self.assertEqual(obs["CameraSensor"].dtype, np.uint8)
+
+            obs, reward, done, info = env.step(env.sample_action())
+            self.assertEqual(obs["CameraSensor"].shape, (2, 3, 24, 32))
+            self.assertEqual(reward.shape, (2,))
+            np.testing.assert_array_equal(done, [0.0, 0.0])
+            obs, reward, done, info = env.step(env.sample_action())
+            np.testing.assert_array_equal(done, [1.0, 1.0])
+            self.assertEqual(len(info), 2)
+            self.assertEqual(info[0]["episode"]["l"], 2)
+            self.assertEqual(info[1]["terminal_observation"]["CameraSensor"].shape, (3, 24, 32))
+            env.close()
+
+    def test_rl_env_shared_memory(self):
+        for protocol_args, uses_shared_memory in [((), True), (("--no_shared_memory",), False)]:
+            engine_exe = mock_backend_command("--sensor", "CameraSensor:uint8:3,24,32", *protocol_args)
+            env = sm.RLEnv(
+                create_map, n_maps=2, n_show=2, engine_exe=engine_exe, engine_port=0, engine_shared_memory_slots=2
+            )
+            engine = env.scene.engine
+            self.assertEqual(engine._shared_memory is not None, uses_shared_memory)
+
+            obs = env.reset()
+            bytes_received = engine.transport.stats()["bytes_received"]
+            obs, reward, done, info = env.step(env.sample_action())
+            self.assertEqual(obs["CameraSensor"].shape, (2, 3, 24, 32))
+            self.assertEqual(reward.shape, (2,))
+            # With shared memory only the location of the reply goes through the socket
+            step_bytes = engine.transport.stats()["bytes_received"] - bytes_received
+            self.assertEqual(step_bytes < obs["CameraSensor"].nbytes, uses_shared_memory)
+
+            # The observations are copied out of the ring, they outlive the shared memory
+            expected = obs["CameraSensor"].copy()
+            env.close()
+            np.testing.assert_array_equal(obs["CameraSensor"], expected)
+
+    def test_rl_env_shared_memory_slot_size(self):
+        # Every step ends the episodes: the replies carry the terminal observations and the node arrays
+        engine_exe = mock_backend_command("--sensor", "CameraSensor:uint8:3,96,128", "--episode_length", "1")
+        for slot_size, fallbacks in [(None, 0), (1024, 3)]:
+            env = sm.RLEnv(
+                lambda index: create_camera_map(index, camera_width=128, camera_height=96),
+                n_maps=2,
+                n_show=2,
+                engine_exe=engine_exe,
+                engine_port=0,
+                engine_shared_memory_slots=2,
+                engine_shared_memory_slot_size=slot_size,
+                engine_node_arrays=True,
+            )
+            env.reset()
+            for _ in range(2):
+                _, _, done, info = env.step(env.sample_action())
+                np.testing.assert_array_equal(done, [1.0, 1.0])
+                self.assertIn("terminal_observation", info[0])
+            # The replies which don't fit in a slot (reset and steps) are counted
+            self.assertEqual(env.scene.engine.stats()["shared_memory_fallbacks"], fallbacks)
+            env.close()
+
+    def test_rl_env_pipelined_steps(self):
+        engine_exe = mock_backend_command("--sensor", "CameraSensor:uint8:3,24,32", "--episode_length", "2")
+        env = sm.RLEnv(
+            create_map,
+            n_maps=2,
+            n_show=2,
+            engine_exe=engine_exe,
+            engine_port=0,
+            engine_max_in_flight=3,
+            engine_shared_memory_slots=4,
+        )
+        env.reset()
+        sequences = [env.step_send_async(env.sample_action()) for _ in range(3)]
+        self.assertEqual(len(env.scene.engine._in_flight), 3)
+
+        # The second step ends the episodes, replies can be read in any order
+        _, _, done, _ = env.step_recv_async(sequences[1])
+        np.testing.assert_array_equal(done, [1.0, 1.0])
+        _, _, done, _ = env.step_recv_async()
+        np.testing.assert_array_equal(done, [0.0, 0.0])
+        _, _, done, _ = env.step_recv_async()
+        np.testing.assert_array_equal(done, [0.0, 0.0])
+        with self.assertRaises(RuntimeError):
+            env.step_recv_async()
+
+        # A full window makes the next send receive the oldest reply first
+        for _ in range(4):
+            env.step_send_async(env.sample_action())
+        self.assertEqual(len(env.scene.engine._in_flight), 3)
+        obs = env.reset()
+        self.assertEqual(obs["CameraSensor"].shape, (2, 3, 24, 32))
+        env.close()
+
+    def test_latency_instrumentation(self):
+        engine_exe = mock_backend_command("--sensor", "CameraSensor:uint8:3,24,32")
+        env = sm.RLEnv(create_map, n_maps=2, n_show=2, engine_exe=engine_exe, engine_port=0)
+        self.assertIsNone(env.scene.engine.latency)
+        env.reset()
+
+        measures = []
+        recorder = env.scene.engine.enable_latency_instrumentation(callback=lambda *measure: measures.append(measure))
+        for _ in range(3):
+            env.step(env.sample_action())
+        stats = recorder.as_dict()
+        for phase in ["encode", "send", "wait", "receive", "decode", "convert", "step", "command/Step"]:
+            self.assertEqual(stats[phase]["count"], 3)
+        self.assertEqual(len(measures), 8 * 3)
+        self.assertGreaterEqual(stats["step"]["total"], stats["command/Step"]["total"])
+        self.assertGreaterEqual(stats["command/Step"]["total"], stats["wait"]["total"])
+
+        # The round trips of pipelined steps are measured from the send of each step to the reception of its reply
+        sequences = [env.step_send_async(env.sample_action()) for _ in range(2)]
+        for sequence in reversed(sequences):
+            env.step_recv_async(sequence)
+        self.assertEqual(recorder.as_dict()["command/Step"]["count"], 5)
+
+        env.scene.engine.disable_latency_instrumentation()
+        env.step(env.sample_action())
+        self.assertEqual(recorder.as_dict()["step"]["count"], 3)
+        env.close()
+
+    def test_engine_timings(self):
+        for protocol_args, engine_timings in [(("--step_latency", "0.01"), True), (("--no_timings",), False)]:
+            engine_exe = mock_backend_command("--sensor", "CameraSensor:uint8:3,24,32", *protocol_args)
+            env = sm.RLEnv(create_map, n_maps=2, n_show=2, engine_exe=engine_exe, engine_port=0)
+            engine = env.scene.engine
+            env.reset()
+            obs, reward, done, info = env.step(env.sample_action())
+            env.step_send_async(env.sample_action())
+            env.step_recv_async()
+
+            stats = engine.stats()
+            self.assertEqual(stats["engine_timings"], engine_timings)
+            self.assertGreater(stats["transport"]["messages_received"], 0)
+            if engine_timings:
+                self.assertEqual(
+                    set(stats["timings"]), {"round_trip", "engine", "wire", "physics", "render", "sensors"}
+                )
+                # The reset observations come from a Step without simulation
+                self.assertEqual(stats["timings"]["physics"]["count"], 3)
+                self.assertGreaterEqual(stats["timings"]["physics"]["min"], 0.01)
+                self.assertGreaterEqual(stats["timings"]["engine"]["min"], stats["timings"]["physics"]["min"])
+                self.assertLessEqual(stats["timings"]["engine"]["max"], stats["timings"]["round_trip"]["max"])
+                self.assertIsNotNone(stats["clock_offset"])
+                self.assertIn("sensors", engine.last_timings)
+                # The mock backend runs on the same host, its perf_counter() clock is the same
+                client_time = engine.to_client_time(engine.last_timings["sent"])
+                self.assertAlmostEqual(client_time, engine.last_timings["sent"], delta=0.05)
+            else:
+                self.assertEqual(stats["timings"], {})
+                self.assertIsNone(stats["clock_offset"])
+            self.assertNotIn("timings", info[0])
+            env.close()
+
+    def test_frame_encoding(self):
+        observations = {}
+        for encoding, protocol_args in [("raw", ()), ("png", ()), ("png", ("--json",)), ("jpeg", ())]:
+            engine_exe = mock_backend_command(
+                "--sensor", "CameraSensor:uint8:3,24,32", "--seed", "0", "--frame_encoding", encoding, *protocol_args
+            )
+            env = sm.RLEnv(create_map, n_maps=2, n_show=2, engine_exe=engine_exe, engine_port=0)
+            obs = env.reset()
+            self.assertEqual(obs["CameraSensor"].shape, (2, 3, 24, 32))
+            self.assertEqual(obs["CameraSensor"].dtype, np.uint8)
+            observations[(encoding,) + protocol_args] = np.array(obs["CameraSensor"])
+            env.close()
+        np.testing.assert_array_equal(observations[("png",)], observations[("raw",)])
+        np.testing.assert_array_equal(observations[("png", "--json")], observations[("raw",)])
+        # Random noise is the worst case for JPEG, the frames are only roughly preserved
+        error = np.abs(observations[("jpeg",)].astype(int) - observations[("raw",)].astype(int)).mean()
+        self.assertLess(error, 64)
+
+    def test_frame_transform_fallback(self):
+        def create_grayscale_map(index: int) -> sm.Asset:
+            root = create_map(index)
+            (camera,) = root.tree_filtered_descendants(lambda node: isinstance(node, sm.Camera))
+            camera.grayscale = True
+            camera.downsample = 4
+            return root
+
+        # The mock backend ignores the camera settings, the frames are converted on the Python side
+        engine_exe = mock_backend_command("--sensor", "CameraSensor:uint8:3,24,32")
+        env = sm.RLEnv(create_grayscale_map, n_maps=2, n_show=2, engine_exe=engine_exe, engine_port=0)
+        self.assertEqual(env.observation_space["CameraSensor"].shape, (1, 6, 8))
+        obs = env.reset()
+        self.assertEqual(obs["CameraSensor"].shape, (2, 1, 6, 8))
+        obs, reward, done, info = env.step(env.sample_action())
+        self.assertEqual(obs["CameraSensor"].shape, (2, 1, 6, 8))
+        self.assertEqual(obs["CameraSensor"].dtype, np.uint8)
+        env.close()
@@ -0,0 +1,126 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+import socket
+import unittest
+
+import numpy as np
+
+from simulate.engine.protocol import (
+    SharedMemoryRing,
+    decode_message,
+    encode_binary_message,
+    encode_json_message,
+    encode_msgpack_message,
+    is_binary_frame,
+    is_msgpack_frame,
+    msgpack,
+    recv_message,
+)
+
+
+class ProtocolTest(unittest.TestCase):
+    def test_json_message_roundtrip(self):
+        message = {"type": "Step", "frame_skip": 2, "action": {"actuator": [[[0.5]]]}}
+        client, server = socket.socketpair()
+        with client, server:
+            client.sendall(encode_json_message(message))
+            response = recv_message(server)
+
+        self.assertFalse(is_binary_frame(response))
+        self.assertEqual(decode_message(response), message)
+
+    def test_binary_message_roundtrip(self):
+        camera = np.arange(2 * 3 * 72 * 96, dtype=np.uint8).reshape((2, 1, 3, 72, 96))
+        reward = np.array([[0.5], [1.0]], dtype=np.float32)
+        message = {
+            "type": "Step",
+            "frame_skip": 2,
+            "actor_sensor_buffers": {"CameraSensor": camera},
+            "actor_reward_buffer": reward,
+        }
+        client, server = socket.socketpair()
+        with client, server:
+            client.sendall(encode_binary_message(message))
+            response = recv_message(server)
+
+        self.assertTrue(is_binary_frame(response))
+        decoded = decode_message(response)
+        self.assertEqual(decoded["type"], "Step")
+        self.assertEqual(decoded["frame_skip"], 2)
+        np.testing.assert_array_equal(decoded["actor_sensor_buffers"]["CameraSensor"], camera)
+        np.testing.assert_array_equal(decoded["actor_reward_buffer"], reward)
+        self.assertEqual(decoded["actor_reward_buffer"].dtype, np.float32)
+
+    def test_binary_message_numpy_scalars(self):
+        message = {"type": "Step", "frame_skip": np.int64(2), "config": {"time_step": np.float32(1.5)}}
+        decoded = decode_message(encode_binary_message(message)[4:])
+        self.assertEqual(decoded, {"type": "Step", "frame_skip": 2, "config": {"time_step": 1.5}})
+        self.assertIsInstance(decoded["frame_skip"], int)
+        self.assertIsInstance(decoded["config"]["time_step"], float)
+
+        decoded = decode_message(encode_binary_message({"action": [np.float32(0.5), np.int32(1)]})[4:])
+        self.assertEqual(decoded, {"action": [0.5, 1]})
+
+    def test_binary_message_sections_are_views(self):
+        done = np.array([True, False, True])
+        response = bytearray(encode_binary_message({"done": done})[4:])
+        decoded = decode_message(response)
+        self.assertTrue(np.shares_memory(decoded["done"], np.frombuffer(response, dtype=np.uint8)))
+
+    def test_shared_memory_ring(self):
+        ring = SharedMemoryRing(n_slots=2, slot_size=1024)
+
+        def write_slot(slot: int, value: int) -> int:
+            frame = encode_binary_message({"obs": np.full(16, value, dtype=np.uint8)})[4:]
+            ring.shm.buf[slot * ring.slot_size : slot * ring.slot_size + len(frame)] = frame
+            return len(frame)
+
+        first = ring.decode_slot(0, write_slot(0, 1))
+        # The backend reuses the slot, the decoded reply is not modified
+        second = ring.decode_slot(0, write_slot(0, 2))
+        np.testing.assert_array_equal(first["obs"], np.full(16, 1))
+        np.testing.assert_array_equal(second["obs"], np.full(16, 2))
+        with self.assertRaises(ValueError):
+            ring.decode_slot(2, 16)
+
+        # The ring is released while the decoded arrays are still alive
+        ring.close()
+        np.testing.assert_array_equal(first["obs"], np.full(16, 1))
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack_message_roundtrip(self):
+        nodes = {f"node_{i}": {"position": [i, 0.5, 0.0], "rotation": [0.0, 0.0, 0.0, 1.0]} for i in range(100)}
+        reward = np.array([[0.5], [1.0]], dtype=np.float32)
+        message = {"nodes": nodes, "actor_reward_buffer": reward, "done": np.bool_(True)}
+        client, server = socket.socketpair()
+        with client, server:
+            client.sendall(encode_msgpack_message(message))
+            response = recv_message(server)
+
+        self.assertTrue(is_msgpack_frame(response))
+        decoded = decode_message(response)
+        self.assertEqual(decoded["nodes"], nodes)
+        self.assertIs(decoded["done"], True)
+        np.testing.assert_array_equal(decoded["actor_reward_buffer"], reward)
+        self.assertEqual(decoded["actor_reward_buffer"].dtype, np.float32)
+
+    def test_closed_connection_raises(self):
+        client, server = socket.socketpair()
+        with server:
+            client.sendall(encode_json_message({"type": "Step"})[:6])
+            client.close()
+            with self.assertRaises(ConnectionError):
+                recv_message(server)
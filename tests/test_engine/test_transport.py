@@ -0,0 +1,91 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+import os
+import socket
+import unittest
+
+import numpy as np
+
+from simulate.engine.protocol import BinaryFrameCodec, decode_message, encode_json_message, recv_message
+from simulate.engine.transport import EngineTransport
+
+
+def connect(transport: EngineTransport) -> socket.socket:
+    if transport.transport == "unix":
+        backend = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        backend.connect(transport.socket_path)
+    else:
+        backend = socket.create_connection((transport.host, transport.port))
+    transport.accept()
+    return backend
+
+
+class EngineTransportTest(unittest.TestCase):
+    def test_tcp_messages(self):
+        transport = EngineTransport(port=0, timeout=5.0)
+        bridge_args = transport.listen()
+        self.assertEqual(bridge_args, ["port", str(transport.port)])
+        with connect(transport) as backend:
+            message = {"type": "Step", "action": {"actuator": np.ones((2, 1, 1), dtype=np.float32)}}
+            transport.send(message, codec=BinaryFrameCodec())
+            message = decode_message(recv_message(backend))
+            np.testing.assert_array_equal(message["action"]["actuator"], np.ones((2, 1, 1)))
+
+            backend.sendall(encode_json_message({"done": True}))
+            backend.sendall(b"\x05\x00\x00\x00error")
+            self.assertEqual(transport.recv_decoded(), {"done": True})
+            self.assertEqual(transport.recv_decoded(), "error")
+
+        stats = transport.stats()
+        self.assertEqual(stats["messages_sent"], 1)
+        self.assertEqual(stats["messages_received"], 2)
+        self.assertEqual(stats["bytes_received"], len(b'{"done": true}') + len(b"error"))
+        transport.close()
+
+    def test_port_in_use(self):
+        first = EngineTransport(port=0)
+        first.listen()
+        with self.assertRaises(OSError):
+            EngineTransport(port=first.port).listen()
+        second = EngineTransport(port=first.port)
+        second.listen(port_fallback=True)
+        self.assertNotEqual(second.port, first.port)
+        first.close()
+        second.close()
+
+    def test_accept_timeout(self):
+        transport = EngineTransport(port=0, timeout=5.0)
+        transport.listen()
+        with self.assertRaises(RuntimeError) as context:
+            transport.accept(timeout=0.1, engine_name="Unity executable")
+        self.assertIn(
+            f"The Unity executable did not connect to {transport.address} within 0.1s", str(context.exception)
+        )
+        # The backend can still connect afterwards, with the timeout of the transport on the connection
+        with connect(transport) as backend:
+            self.assertEqual(transport.client.gettimeout(), 5.0)
+            self.assertIsNotNone(backend)
+        transport.close()
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix domain sockets are not available")
+    def test_unix_messages(self):
+        transport = EngineTransport(transport="unix")
+        self.assertEqual(transport.listen(), ["socket", transport.socket_path])
+        with connect(transport) as backend:
+            transport.send({"type": "Reset"})
+            self.assertEqual(decode_message(recv_message(backend)), {"type": "Reset"})
+        transport.close()
+        self.assertFalse(os.path.exists(transport.socket_path))
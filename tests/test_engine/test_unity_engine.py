@@ -0,0 +1,123 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+import os
+import socket
+import sys
+import tarfile
+import tempfile
+import unittest
+from concurrent import futures
+
+import simulate as sm
+from simulate.engine.mock_backend import mock_backend_command
+from simulate.engine.unity_engine import extract_unity_build
+
+
+def create_build_archive(tmpdir: str) -> str:
+    build_dir = os.path.join(tmpdir, "Build-StandaloneLinux64")
+    os.makedirs(build_dir)
+    with open(os.path.join(build_dir, "StandaloneLinux64"), "w") as f:
+        f.write("build")
+    archive_path = os.path.join(tmpdir, "StandaloneLinux64.tar.gz")
+    with tarfile.open(archive_path, "w:gz") as archive:
+        archive.add(build_dir, arcname="Build-StandaloneLinux64")
+    return archive_path
+
+
+class UnityBuildCacheTest(unittest.TestCase):
+    def test_extract_once(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = create_build_archive(tmpdir)
+            cache_dir = os.path.join(tmpdir, "cache")
+
+            main_dir = extract_unity_build(archive_path, cache_dir)
+            self.assertEqual(os.path.basename(main_dir), "Build-StandaloneLinux64")
+            executable = os.path.join(main_dir, "StandaloneLinux64")
+            with open(executable) as f:
+                self.assertEqual(f.read(), "build")
+
+            # The extracted build is reused, not extracted again
+            with open(executable, "w") as f:
+                f.write("already extracted")
+            self.assertEqual(extract_unity_build(archive_path, cache_dir), main_dir)
+            with open(executable) as f:
+                self.assertEqual(f.read(), "already extracted")
+
+    def test_concurrent_extraction(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = create_build_archive(tmpdir)
+            cache_dir = os.path.join(tmpdir, "cache")
+            with futures.ThreadPoolExecutor(max_workers=4) as executor:
+                main_dirs = list(executor.map(lambda _: extract_unity_build(archive_path, cache_dir), range(4)))
+            self.assertEqual(len(set(main_dirs)), 1)
+            self.assertEqual(len([name for name in os.listdir(cache_dir) if not name.endswith(".lock")]), 1)
+
+
+class UnityEngineConnectionTest(unittest.TestCase):
+    def test_os_assigned_port(self):
+        scene = sm.Scene(engine="unity", engine_exe=mock_backend_command(), engine_port=0)
+        self.assertNotEqual(scene.engine.port, 0)
+        scene += sm.Box(name="box")
+        scene.show()
+        self.assertEqual(scene.step(), {"nodes": {}, "frames": {}})
+        scene.close()
+
+    def test_port_in_use(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as other_server:
+            other_server.bind(("127.0.0.1", 0))
+            other_server.listen()
+            port = other_server.getsockname()[1]
+
+            # The executable is told the port actually bound
+            scene = sm.Scene(engine="unity", engine_exe=mock_backend_command(), engine_port=port)
+            self.assertNotEqual(scene.engine.port, port)
+            scene.show()
+            self.assertEqual(scene.step(), {"nodes": {}, "frames": {}})
+            scene.close()
+
+            # The editor only connects to its own port
+            with self.assertRaises(OSError):
+                sm.Scene(engine="unity", engine_exe="debug", engine_port=port)
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "Symbolic links are not available")
+    def test_executable_path_with_spaces(self):
+        with tempfile.TemporaryDirectory(prefix="simulate engine ") as tmpdir:
+            # An interpreter installed in a directory with spaces in its name
+            python_path = os.path.join(tmpdir, "python interpreter")
+            os.symlink(sys.executable, python_path)
+            engine_exe = [python_path, *mock_backend_command()[1:]]
+            scene = sm.Scene(engine="unity", engine_exe=engine_exe, engine_port=0)
+            scene += sm.Box(name="box")
+            scene.show()
+            self.assertEqual(scene.step(), {"nodes": {}, "frames": {}})
+            scene.close()
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix domain sockets are not available")
+    def test_unix_transport(self):
+        scene = sm.Scene(engine="unity", engine_exe=mock_backend_command(), engine_transport="unix")
+        socket_path = scene.engine.socket_path
+        self.assertEqual(scene.engine.client.family, socket.AF_UNIX)
+        self.assertIsNone(scene.engine.port)
+        scene += sm.Box(name="box")
+        scene.show()
+        self.assertEqual(scene.step(), {"nodes": {}, "frames": {}})
+        scene.close()
+        self.assertFalse(os.path.exists(socket_path))
+
+        # The Unity build and editor only connect over TCP
+        for engine_exe in ("", "debug"):
+            with self.assertRaises(ValueError):
+                sm.Scene(engine="unity", engine_exe=engine_exe, engine_transport="unix")
@@ -0,0 +1,211 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+import base64
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+import simulate as sm
+from simulate.engine.mock_backend import mock_backend_command
+from simulate.engine.protocol import decode_message, encode_binary_message
+
+from .test_wrappers.create_env import create_map
+
+
+class RLEnvConversionTest(unittest.TestCase):
+    def test_convert_json_buffers(self):
+        uint_data = {"type": "uint8", "shape": [1, 1, 2], "uintBuffer": [3, 255]}
+        float_data = {"type": "float", "shape": [2, 1], "floatBuffer": [0.5, 1.5]}
+
+        uint_obs = sm.RLEnv._convert_to_numpy(uint_data)
+        float_obs = sm.RLEnv._convert_to_numpy(float_data)
+
+        self.assertEqual(uint_obs.dtype, np.uint8)
+        np.testing.assert_array_equal(uint_obs, [[[3, 255]]])
+        self.assertEqual(float_obs.dtype, np.float32)
+        np.testing.assert_array_equal(float_obs, [[0.5], [1.5]])
+
+    def test_convert_raw_bytes_buffers(self):
+        pixels = np.arange(2 * 3 * 4, dtype=np.uint8)
+        rewards = np.array([0.25, -1.0], dtype=np.float32)
+
+        # Raw bytes received in a binary frame section
+        message = decode_message(
+            encode_binary_message(
+                {
+                    "actor_sensor_buffers": {
+                        "CameraSensor": {"type": "uint8", "shape": [2, 1, 3, 4], "bytesBuffer": pixels}
+                    }
+                }
+            )[4:]
+        )
+        camera_obs = sm.RLEnv._convert_to_numpy(message["actor_sensor_buffers"]["CameraSensor"])
+        self.assertEqual(camera_obs.shape, (2, 1, 3, 4))
+        np.testing.assert_array_equal(camera_obs.reshape(-1), pixels)
+
+        # Raw bytes base64 encoded in a JSON message
+        reward_data = {"type": "float", "shape": [2, 1], "bytesBuffer": base64.b64encode(rewards.tobytes()).decode()}
+        reward_obs = sm.RLEnv._convert_to_numpy(reward_data)
+        self.assertEqual(reward_obs.dtype, np.float32)
+        np.testing.assert_array_equal(reward_obs.flatten(), rewards)
+
+    def test_convert_unknown_type(self):
+        with self.assertRaises(TypeError):
+            sm.RLEnv._convert_to_numpy({"type": "string", "shape": [1], "stringBuffer": ["a"]})
+
+
+class RecordingEngine:
+    def __init__(self, binary_protocol: bool):
+        self.binary_protocol = binary_protocol
+        self.sent = []
+
+    def step_send_async(self, **kwargs):
+        self.sent.append(kwargs)
+        return len(self.sent)
+
+
+def create_env_without_engine(binary_protocol: bool, n_show: int = 4, n_actors_per_map: int = 1) -> sm.RLEnv:
+    env = sm.RLEnv.__new__(sm.RLEnv)
+    env.n_show = n_show
+    env.n_actors_per_map = n_actors_per_map
+    env.n_actors = n_show * n_actors_per_map
+    env.action_tags = ["actuator"]
+    env.scene = SimpleNamespace(engine=RecordingEngine(binary_protocol))
+    return env
+
+
+class RLEnvActionEncodingTest(unittest.TestCase):
+    def test_batched_actions_binary(self):
+        env = create_env_without_engine(binary_protocol=True)
+        actions = np.arange(8, dtype=np.float64).reshape((4, 2))
+        env.step_send_async(actions)
+
+        sent = env.scene.engine.sent[0]["action"]["actuator"]
+        self.assertIsInstance(sent, np.ndarray)
+        self.assertEqual(sent.shape, (4, 1, 2))
+        self.assertEqual(sent.dtype, np.float32)
+        np.testing.assert_array_equal(sent.reshape(-1), np.arange(8))
+
+    def test_discrete_actions_binary(self):
+        env = create_env_without_engine(binary_protocol=True)
+        env.step_send_async(np.array([0, 2, 1, 3]))
+
+        sent = env.scene.engine.sent[0]["action"]["actuator"]
+        # Integer actions are not cast to floats, as with the JSON protocol
+        self.assertTrue(np.issubdtype(sent.dtype, np.integer))
+        np.testing.assert_array_equal(sent.reshape(-1), [0, 2, 1, 3])
+
+    def test_batched_actions_json(self):
+        env = create_env_without_engine(binary_protocol=False, n_show=2)
+        action = {"actuator": np.array([1, 2], dtype=np.int32)}
+        env.step_send_async(action)
+
+        self.assertEqual(env.scene.engine.sent[0]["action"]["actuator"], [[[1]], [[2]]])
+        # The user action is not modified
+        self.assertIsInstance(action["actuator"], np.ndarray)
+
+    def test_single_actions(self):
+        env = create_env_without_engine(binary_protocol=True, n_show=1)
+        env.step_send_async(1)
+        env.step_send_async([0.5, 1.0])
+        self.assertEqual(env.scene.engine.sent[0]["action"]["actuator"], [[[1]]])
+        self.assertEqual(env.scene.engine.sent[1]["action"]["actuator"], [[[0.5, 1.0]]])
+
+        with self.assertRaises(ValueError):
+            env.step_send_async({"unknown": 1})
+
+
+def create_mock_env(*args: str) -> sm.RLEnv:
+    engine_exe = mock_backend_command("--sensor", "CameraSensor:uint8:3,8,16", "--episode_length", "2", *args)
+    return sm.RLEnv(create_map, n_maps=3, n_show=3, engine_exe=engine_exe, engine_port=0)
+
+
+class RLEnvEpisodeInfoTest(unittest.TestCase):
+    def test_episode_infos(self):
+        env = create_mock_env()
+        env.reset()
+
+        _, first_reward, done, info = env.step(np.zeros((3, 1)))
+        np.testing.assert_array_equal(done, [0.0, 0.0, 0.0])
+        self.assertEqual(info, [{}, {}, {}])
+        # Each map gets its own info
+        info[0]["custom"] = True
+        self.assertEqual(info[1:], [{}, {}])
+
+        obs, second_reward, done, info = env.step(np.zeros((3, 1)))
+        np.testing.assert_array_equal(done, [1.0, 1.0, 1.0])
+        for index in range(3):
+            episode = info[index]["episode"]
+            self.assertAlmostEqual(episode["r"], first_reward[index] + second_reward[index], places=5)
+            self.assertEqual(episode["l"], 2)
+            self.assertGreaterEqual(episode["t"], 0.0)
+            self.assertNotIn("TimeLimit.truncated", info[index])
+            np.testing.assert_array_equal(
+                info[index]["terminal_observation"]["CameraSensor"], obs["CameraSensor"][index]
+            )
+
+        # The returns and lengths start over with the next episodes
+        _, third_reward, _, _ = env.step(np.zeros((3, 1)))
+        _, fourth_reward, _, info = env.step(np.zeros((3, 1)))
+        self.assertAlmostEqual(info[0]["episode"]["r"], third_reward[0] + fourth_reward[0], places=5)
+        self.assertEqual(info[0]["episode"]["l"], 2)
+        env.close()
+
+    def test_truncated_episodes(self):
+        env = create_mock_env("--truncation")
+        env.reset()
+        env.step(np.zeros((3, 1)))
+        _, _, done, info = env.step(np.zeros((3, 1)))
+        np.testing.assert_array_equal(done, [1.0, 1.0, 1.0])
+        self.assertEqual([map_info["TimeLimit.truncated"] for map_info in info], [True, True, True])
+        env.close()
+
+
+class RLEnvVecEnvMethodsTest(unittest.TestCase):
+    def test_attributes_and_methods(self):
+        env = create_mock_env()
+        self.assertEqual(env.num_envs, 3)
+        self.assertEqual(env.get_attr("n_show"), [3, 3, 3])
+        env.set_attr("custom_value", 2, indices=[1])
+        self.assertEqual(env.get_attr("custom_value", indices=1), [2])
+        self.assertEqual(env.env_method("env_is_wrapped", object, indices=[0, 2]), [[False] * 3, [False] * 3])
+        (actions,) = env.env_method("sample_action", indices=[0])
+        self.assertEqual(len(actions), 3)
+        env.close()
+
+    def test_step_async_and_images(self):
+        env = create_mock_env()
+        with self.assertRaises(RuntimeError):
+            env.step_wait()
+        with self.assertRaises(RuntimeError):
+            env.get_images()
+
+        obs = env.reset()
+        images = env.get_images()
+        self.assertEqual(images.shape, (3, 8, 16, 3))
+        self.assertTrue(images.flags["C_CONTIGUOUS"])
+        np.testing.assert_array_equal(images[1, 2, 3], obs["CameraSensor"][1, :, 2, 3])
+
+        env.step_async(np.zeros((3, 1)))
+        with self.assertRaises(RuntimeError):
+            env.step_async(np.zeros((3, 1)))
+        obs, reward, done, info = env.step_wait()
+        self.assertEqual(obs["CameraSensor"].shape, (3, 3, 8, 16))
+        self.assertEqual(reward.shape, (3,))
+        self.assertEqual(len(info), 3)
+        np.testing.assert_array_equal(env.get_images()[0, 4, 5], obs["CameraSensor"][0, :, 4, 5])
+        env.close()
@@ -0,0 +1,97 @@
+# Copyright 2022 The HuggingFace Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Lint as: python3
+import unittest
+
+import numpy as np
+
+import simulate as sm
+from simulate.engine.mock_backend import mock_backend_command
+
+from .test_wrappers.create_env import create_map
+
+
+try:
+    import gymnasium
+except ImportError:
+    gymnasium = None
+
+
+def create_vector_env(*args: str) -> sm.VectorRLEnv:
+    engine_exe = mock_backend_command("--sensor", "CameraSensor:uint8:3,8,16", "--episode_length", "2", *args)
+    return sm.VectorRLEnv(create_map, n_maps=3, n_show=3, engine_exe=engine_exe, engine_port=0)
+
+
+class VectorRLEnvTest(unittest.TestCase):
+    def test_step_and_autoreset(self):
+        env = create_vector_env()
+        self.assertEqual(env.num_envs, 3)
+        self.assertEqual(env.observation_space["CameraSensor"].shape, (3, 3, 8, 16))
+        self.assertEqual(env.action_space.shape[0], 3)
+
+        obs, infos = env.reset(seed=0)
+        self.assertEqual(obs["CameraSensor"].shape, (3, 3, 8, 16))
+        self.assertEqual(infos, {})
+
+        obs, rewards, terminated, truncated, infos = env.step(env.action_space.sample())
+        self.assertEqual(rewards.shape, (3,))
+        self.assertEqual(terminated.dtype, bool)
+        np.testing.assert_array_equal(terminated, [False, False, False])
+        np.testing.assert_array_equal(truncated, [False, False, False])
+        self.assertEqual(infos, {})
+
+        # The episodes end on the second step, the maps are reset by the backend in the same step
+        obs, rewards, terminated, truncated, infos = env.step(env.action_space.sample())
+        np.testing.assert_array_equal(terminated, [True, True, True])
+        np.testing.assert_array_equal(truncated, [False, False, False])
+        np.testing.assert_array_equal(infos["_final_obs"], [True, True, True])
+        self.assertEqual(infos["final_obs"]["CameraSensor"].shape, (3, 3, 8, 16))
+        np.testing.assert_array_equal(infos["final_info"]["episode"]["l"], [2, 2, 2])
+        self.assertEqual(infos["final_info"]["episode"]["r"].shape, (3,))
+        self.assertEqual(env.render().shape, (3, 8, 16, 3))
+        env.close()
+
+    @unittest.skipIf(gymnasium is None, "gymnasium is not installed")
+    def test_gymnasium_spaces(self):
+        env = create_vector_env()
+        self.assertIsInstance(env, gymnasium.vector.VectorEnv)
+        self.assertIsInstance(env.single_observation_space, gymnasium.spaces.Dict)
+        self.assertIsInstance(env.single_observation_space["CameraSensor"], gymnasium.spaces.Box)
+        self.assertIsInstance(env.observation_space["CameraSensor"], gymnasium.spaces.Box)
+        self.assertIsInstance(env.single_action_space, gymnasium.spaces.Space)
+        self.assertEqual(env.observation_space["CameraSensor"].shape, (3, 3, 8, 16))
+        obs, _ = env.reset(seed=0)
+        self.assertTrue(env.observation_space.contains(obs))
+        obs, _, _, _, _ = env.step(env.action_space.sample())
+        self.assertTrue(env.observation_space.contains(obs))
+        env.close()
+
+    def test_truncation_and_seed(self):
+        env = create_vector_env("--truncation")
+        actions = np.zeros(env.action_space.shape, dtype=env.action_space.dtype)
+
+        env.reset(seed=7)
+        _, first_rewards, _, _, _ = env.step(actions)
+        env.reset(seed=7)
+        _, rewards, _, _, _ = env.step(actions)
+        np.testing.assert_array_equal(rewards, first_rewards)
+        with self.assertRaises(ValueError):
+            env.reset(seed=[7, 8, 9])
+
+        obs, rewards, terminated, truncated, infos = env.step(actions)
+        np.testing.assert_array_equal(terminated, [False, False, False])
+        np.testing.assert_array_equal(truncated, [True, True, True])
+        np.testing.assert_array_equal(infos["_final_info"], [True, True, True])
+        env.close()
@@ -15,8 +15,10 @@
 # Lint as: python3
 """ A very simple environment creation ethod."""
 import random
+from typing import List
 
 import simulate as sm
+from simulate.engine.unity_engine import UnityEngine
 
 
 def create_env():
@@ -32,3 +34,20 @@ def create_env():
     reward = sm.RewardFunction(collectable, actor, is_collectable=True)
     scene += [collectable, actor, reward]
     return scene
+
+
+def create_map(index: int, camera_width: int = 16, camera_height: int = 8) -> sm.Asset:
+    """Create the map of index `index`: a floor and an egocentric camera actor, for the mock backend tests."""
+    root = sm.Asset(name=f"root_{index}")
+    root += sm.Box(name=f"floor_{index}", position=[0, 0, 0], bounds=[-5, 5, 0, 0.1, -5, 5])
+    root += sm.EgocentricCameraActor(name=f"actor_{index}", camera_width=camera_width, camera_height=camera_height)
+    return root
+
+
+def steps_overlap(engines: List[UnityEngine]) -> bool:
+    """Whether the last steps of the engines were processed concurrently by their backends, from the timings they
+    report: each backend received its step before any of them replied.
+    """
+    received = [engine.to_client_time(engine.last_timings["received"]) for engine in engines]
+    sent = [engine.to_client_time(engine.last_timings["sent"]) for engine in engines]
+    return max(received) < min(sent)
@@ -12,12 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import os
 import random
+import sys
+import tempfile
+import threading
+import time
 
 # Lint as: python3
 import unittest
 
+import numpy as np
+
 import simulate as sm
+from simulate.engine.mock_backend import mock_backend_command
+
+from .create_env import create_map, steps_overlap
 
 
 def create_env(dummy_port: int):
@@ -42,3 +53,263 @@ class ParallelSimulateTest(unittest.TestCase):
         # env = sm.ParallelSimulate(env_fn=create_env, n_parallel=2)
 
         # obs = env.reset()
+
+
+def create_mock_rl_env(port: int, n_show: int = 2, step_latency: float = 0.0) -> sm.RLEnv:
+    """The port given by the parallel environment only identifies the environment, the OS picks a free one."""
+    engine_exe = mock_backend_command(
+        "--sensor", "CameraSensor:uint8:3,8,16", "--episode_length", "3", "--step_latency", str(step_latency)
+    )
+    return sm.RLEnv(create_map, n_maps=n_show, n_show=n_show, engine_exe=engine_exe, engine_port=0)
+
+
+class ParallelRLEnvTest(unittest.TestCase):
+    def test_step_with_straggler(self):
+        # The first executable replies last, the replies should still be batched in the environment order
+        latencies = [0.2, 0.0, 0.05]
+        env = sm.ParallelRLEnv(
+            lambda port: create_mock_rl_env(port, step_latency=latencies[port - 57201]),
+            n_parallel=3,
+            starting_port=57201,
+        )
+        obs = env.reset()
+        self.assertEqual(obs["CameraSensor"].shape, (6, 3, 8, 16))
+
+        for i in range(3):
+            actions = np.array([env.action_space.sample() for _ in range(env.num_envs)])
+            obs, reward, done, info = env.step(actions)
+            self.assertEqual(obs["CameraSensor"].shape, (6, 3, 8, 16))
+            self.assertEqual(reward.shape, (6,))
+            self.assertEqual(len(info), 6)
+        np.testing.assert_array_equal(done, np.ones(6))
+        env.close()
+
+    def test_step_inplace_buffers(self):
+        env = sm.ParallelRLEnv(create_mock_rl_env, n_parallel=2, starting_port=57301, inplace_buffers=True)
+        reset_obs = env.reset()
+        self.assertEqual(reset_obs["CameraSensor"].shape, (4, 3, 8, 16))
+
+        for i in range(3):
+            actions = np.array([env.action_space.sample() for _ in range(env.num_envs)])
+            obs, reward, done, info = env.step(actions)
+            # The same arrays are filled at each step
+            self.assertIs(obs["CameraSensor"], reset_obs["CameraSensor"])
+            self.assertEqual(obs["CameraSensor"].dtype, np.uint8)
+            self.assertEqual(reward.shape, (4,))
+            self.assertEqual(len(info), 4)
+        np.testing.assert_array_equal(done, np.ones(4))
+        # Each sub-environment wrote its observations in its own slice
+        self.assertTrue(all(obs["CameraSensor"][i].any() for i in range(4)))
+        env.close()
+
+    def test_astep(self):
+        env = sm.ParallelRLEnv(
+            lambda port: create_mock_rl_env(port, step_latency=0.2), n_parallel=3, starting_port=57351
+        )
+
+        async def run_episode():
+            obs = await env.areset()
+            self.assertEqual(obs["CameraSensor"].shape, (6, 3, 8, 16))
+            for i in range(3):
+                actions = np.array([env.action_space.sample() for _ in range(env.num_envs)])
+                obs, reward, done, info = await env.astep(actions)
+                # The executables are stepped concurrently from the event loop
+                self.assertTrue(steps_overlap([sub_env.scene.engine for sub_env in env.envs]))
+            return obs, reward, done, info
+
+        obs, reward, done, info = asyncio.run(run_episode())
+        self.assertEqual(obs["CameraSensor"].shape, (6, 3, 8, 16))
+        self.assertEqual(reward.shape, (6,))
+        self.assertEqual(len(info), 6)
+        np.testing.assert_array_equal(done, np.ones(6))
+
+        # The synchronous API can still be used on the same connections
+        obs = env.reset()
+        obs, reward, done, info = env.step(np.array([env.action_space.sample() for _ in range(env.num_envs)]))
+        self.assertEqual(reward.shape, (6,))
+        env.close()
+
+    def test_step_wait_after_command(self):
+        env = sm.ParallelRLEnv(create_mock_rl_env, n_parallel=2, starting_port=57781)
+        env.reset()
+        env.step_async(np.zeros((4, 1)))
+        # Running a command receives the step reply of the first environment before the command reply
+        env.envs[0].scene.engine.run_command("Reset")
+        # Waiting on the socket of the first environment would end with a TimeoutError
+        obs, reward, done, info = env.step_wait()
+        self.assertEqual(obs["CameraSensor"].shape, (4, 3, 8, 16))
+        self.assertEqual(reward.shape, (4,))
+        env.close()
+
+    def test_vec_env_methods(self):
+        env = sm.ParallelRLEnv(create_mock_rl_env, n_parallel=2, starting_port=57601)
+        self.assertEqual(env.get_attr("n_show"), [2, 2, 2, 2])
+        self.assertEqual(env.get_attr("n_show", indices=[3, 0]), [2, 2])
+        env.set_attr("custom_value", 5, indices=3)
+        self.assertFalse(hasattr(env.envs[0], "custom_value"))
+        self.assertEqual(env.envs[1].custom_value, 5)
+        # The indices of a sub-environment share the result of one call
+        self.assertEqual(env.env_method("env_is_wrapped", object, indices=[2, 3]), [[False, False], [False, False]])
+        self.assertEqual(env.env_is_wrapped(object, indices=[0, 1]), [False, False])
+
+        obs = env.reset()
+        actions = np.array([env.action_space.sample() for _ in range(env.num_envs)])
+        env.step_async(actions)
+        obs, reward, done, info = env.step_wait()
+        self.assertEqual(reward.shape, (4,))
+        images = env.get_images()
+        self.assertEqual(images.shape, (4, 8, 16, 3))
+        np.testing.assert_array_equal(images, obs["CameraSensor"].transpose(0, 2, 3, 1))
+        env.close()
+
+
+class SubprocParallelRLEnvTest(unittest.TestCase):
+    def test_step(self):
+        env = sm.SubprocParallelRLEnv(create_mock_rl_env, n_parallel=2, starting_port=57401)
+        self.assertEqual(env.num_envs, 4)
+        obs = env.reset()
+        self.assertEqual(obs["CameraSensor"].shape, (4, 3, 8, 16))
+        self.assertEqual(obs["CameraSensor"].dtype, np.uint8)
+
+        for i in range(3):
+            actions = np.array([env.action_space.sample() for _ in range(env.num_envs)])
+            obs, reward, done, info = env.step(actions)
+            self.assertEqual(obs["CameraSensor"].shape, (4, 3, 8, 16))
+            self.assertEqual(reward.shape, (4,))
+            self.assertEqual(len(info), 4)
+        np.testing.assert_array_equal(done, np.ones(4))
+        # Each worker wrote the observations of its sub-environment in its rows of the shared arrays
+        self.assertTrue(all(obs["CameraSensor"][i].any() for i in range(4)))
+        env.close()
+
+    def test_vec_env_methods(self):
+        env = sm.SubprocParallelRLEnv(create_mock_rl_env, n_parallel=2, starting_port=57651)
+        self.assertEqual(env.get_attr("n_show", indices=[0, 2]), [2, 2])
+        env.set_attr("custom_value", 5, indices=[2, 3])
+        self.assertEqual(env.get_attr("custom_value", indices=2), [5])
+        with self.assertRaises(RuntimeError):
+            env.get_attr("custom_value", indices=0)
+        self.assertEqual(env.env_method("env_is_wrapped", object, indices=[0]), [[False, False]])
+
+        env.reset()
+        env.step_async(np.array([env.action_space.sample() for _ in range(env.num_envs)]))
+        obs, reward, done, info = env.step_wait()
+        self.assertEqual(len(info), 4)
+        images = env.get_images()
+        self.assertEqual(images.shape, (4, 8, 16, 3))
+        np.testing.assert_array_equal(images, obs["CameraSensor"].transpose(0, 2, 3, 1))
+        env.close()
+
+    def test_step_multiple_actors_per_map(self):
+        env = sm.SubprocParallelRLEnv(create_mock_multi_actor_env, n_parallel=2, starting_port=57671)
+        # One row per actor: 2 environments showing 2 maps of 2 actors
+        self.assertEqual(env.num_envs, 8)
+        self.assertEqual(env.n_rows_per_env, 4)
+        obs = env.reset()
+        self.assertEqual(obs["CameraSensor"].shape, (8, 3, 8, 16))
+        for i in range(3):
+            actions = np.array([env.action_space.sample() for _ in range(env.num_envs)])
+            obs, reward, done, info = env.step(actions)
+            # Each worker got the actions of its own actors
+            last_actions = env.get_attr("last_actions", indices=[0, 4])
+            np.testing.assert_array_equal(np.concatenate(last_actions).reshape(-1), actions)
+            self.assertEqual(reward.shape, (8,))
+            self.assertEqual(len(info), 8)
+        self.assertEqual(env.get_attr("n_actors_per_map", indices=7), [2])
+        env.close()
+
+    def test_worker_error(self):
+        with self.assertRaises(RuntimeError):
+            sm.SubprocParallelRLEnv(create_failing_env, n_parallel=2, starting_port=57451)
+
+
+def create_multi_actor_map(index: int) -> sm.Asset:
+    root = sm.Asset(name=f"root_{index}")
+    for actor_index in range(2):
+        root += sm.EgocentricCameraActor(name=f"actor_{index}_{actor_index}", camera_width=16, camera_height=8)
+    return root
+
+
+class RecordingRLEnv(sm.RLEnv):
+    """RLEnv keeping the last actions it was stepped with."""
+
+    def step(self, action):
+        self.last_actions = np.array(action)
+        return super().step(action)
+
+
+def create_mock_multi_actor_env(port: int) -> sm.RLEnv:
+    engine_exe = mock_backend_command("--sensor", "CameraSensor:uint8:3,8,16", "--n_actors_per_map", "2")
+    return RecordingRLEnv(create_multi_actor_map, n_maps=2, n_show=2, engine_exe=engine_exe, engine_port=0)
+
+
+def create_failing_env(port: int) -> sm.RLEnv:
+    raise ValueError(f"No environment on port {port}")
+
+
+class ParallelStartupTest(unittest.TestCase):
+    def test_parallel_startup(self):
+        env = sm.ParallelRLEnv(
+            create_mock_rl_env, n_parallel=3, starting_port=57501, parallel_startup=True, startup_timeout=60
+        )
+        self.assertEqual(env.num_envs, 6)
+        obs = env.reset()
+        self.assertEqual(obs["CameraSensor"].shape, (6, 3, 8, 16))
+        actions = np.array([env.action_space.sample() for _ in range(env.num_envs)])
+        obs, reward, done, info = env.step(actions)
+        self.assertEqual(reward.shape, (6,))
+        env.close()
+
+    def test_parallel_startup_failures(self):
+        closed_ports = []
+
+        class StartedEnv:
+            def __init__(self, port: int):
+                self.port = port
+
+            def close(self):
+                closed_ports.append(self.port)
+
+        def env_fn(port: int) -> StartedEnv:
+            if port == 57552:
+                raise ValueError("Executable not found")
+            if port == 57553:
+                time.sleep(0.5)
+            return StartedEnv(port)
+
+        with self.assertRaises(RuntimeError) as context:
+            sm.ParallelRLEnv(env_fn, n_parallel=3, starting_port=57551, parallel_startup=True, startup_timeout=0.1)
+        message = str(context.exception)
+        self.assertIn("port 57552): ValueError('Executable not found')", message)
+        self.assertIn("port 57553): not started after 0.1s", message)
+        self.assertNotIn("port 57551", message)
+
+        # The environments which started, even after the timeout, are closed
+        deadline = time.perf_counter() + 10.0
+        while len(closed_ports) < 2 and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(sorted(closed_ports), [57551, 57553])
+
+    def test_parallel_startup_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # An executable which never connects, and leaves a file behind if it is not terminated
+            marker_path = os.path.join(tmp_dir, "still_running")
+            script_path = os.path.join(tmp_dir, "silent_engine.py")
+            with open(script_path, "w") as f:
+                f.write(f"import time\ntime.sleep(2)\nopen({marker_path!r}, 'w').close()\n")
+
+            def env_fn(port: int) -> sm.RLEnv:
+                engine_exe = [sys.executable, script_path]
+                return sm.RLEnv(create_map, engine_exe=engine_exe, engine_port=0)
+
+            with self.assertRaises(RuntimeError) as context:
+                sm.ParallelRLEnv(env_fn, n_parallel=2, starting_port=57561, parallel_startup=True, startup_timeout=1)
+            # The port actually bound is reported
+            self.assertRegex(str(context.exception), r"\(port [1-9][0-9]*\)")
+            # The executables were terminated before the end of their sleep, when the startup timed out
+            self.assertFalse(os.path.exists(marker_path))
+
+            # The startup threads stopped waiting and the executables were terminated
+            time.sleep(2.5)
+            self.assertFalse(any(thread.name.startswith("ParallelRLEnv") for thread in threading.enumerate()))
+            self.assertFalse(os.path.exists(marker_path))